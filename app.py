@@ -1,45 +1,245 @@
-import gradio as gr
-from quality_check import start_quality_check
-from report_generator import generate_simple_report, generate_html_report
+import asyncio
+import logging
+import os
+
+# gradio 只在构建界面时导入（见 build_demo），质检核心和处理函数可以无界面导入
+from live_check import LiveChecker, serve_live
+from parallel_check import iter_parallel_quality_check
+from quality_check import (
+    CheckStats, is_archive, iter_member_quality_check, load_matcher_timed, start_lexicon_watcher,
+)
+from report_generator import (
+    DEFAULT_PAGE_SIZE, generate_html_details, generate_html_report, generate_html_summary, paginate_results,
+)
+from run_metrics import STAGE_RENDER, RunMetrics, registry, render_metrics_footer
 
 # ========== 界面标题区域 ==========
 title = "### AI 视频通话文本质检小工具"
 
-# ========== 全局变量存储质检结果 ==========
-current_check_result = []
+# ========== 并发配置（可通过环境变量调整） ==========
+# 同时执行的质检任务数上限，超出的请求在队列中排队并显示排队位置
+CHECK_CONCURRENCY_LIMIT = int(os.environ.get("QC_CONCURRENCY_LIMIT", "4"))
+# 排队请求数上限，超出时新请求直接提示繁忙
+QUEUE_MAX_SIZE = int(os.environ.get("QC_QUEUE_MAX_SIZE", "64"))
+# 每质检多少句刷新一次进度
+PROGRESS_EVERY = 2000
+# 文本超过该大小（MB）时分块并行质检（0 表示始终顺序质检）
+PARALLEL_MIN_MB = float(os.environ.get("QC_PARALLEL_MIN_MB", "32"))
+# 实时质检默认监听端口，以及界面刷新间隔（秒）
+LIVE_DEFAULT_PORT = int(os.environ.get("QC_LIVE_PORT", "9900"))
+LIVE_REFRESH_SECONDS = 0.2
+
+# ========== 会话状态（每个浏览器会话独立保存质检结果） ==========
+def new_session() -> dict:
+    """
+    创建空的会话状态
+    返回：{'key': 本次结果对应的输入标识, 'results': 当前成员的 CheckResult 列表, 'stats': 当前成员的 CheckStats,
+           'metrics': 本次质检的运行指标, 'members': [(成员名, CheckResult 列表, CheckStats), ...]}
+    说明：上传 .zip 时每个 TXT 成员单独保存结果，普通文本和 .gz 只有一个成员
+    """
+    return {'key': None, 'results': [], 'stats': None, 'metrics': None, 'members': []}
+
+def _input_key(file_path: str, lexicon_version: str) -> tuple:
+    """
+    生成输入标识（文本路径 + 大小 + 修改时间 + 词库版本），输入和词库都不变时可直接复用上次结果
+    参数：file_path - 文本文件路径
+          lexicon_version - 本次实际使用的词库版本（matcher.version，按内容哈希；默认词库热更新后随之变化）
+    返回：输入标识元组
+    """
+    if file_path and os.path.exists(file_path):
+        stat = os.stat(file_path)
+        return (file_path, stat.st_size, stat.st_mtime_ns), lexicon_version
+    return file_path, lexicon_version
 
 # ========== 核心质检函数（按钮触发，新增 CSV 词库支持） ==========
-def start_quality_check_handler(file, csv_file):
+def _no_progress(*args, **kwargs) -> None:
+    """无界面调用时的进度回调（不做任何事）"""
+
+def _render_session(session: dict, problems_only: bool, show_metrics: bool, metrics: RunMetrics = None) -> tuple:
+    """
+    渲染会话中当前成员的摘要和第 1 页明细
+    参数：session - 会话状态
+          problems_only - 明细是否只显示问题句
+          show_metrics - 是否在摘要下方显示各阶段耗时
+          metrics - 本次新质检的运行指标（可选，记录渲染耗时后结束本次计时）
+    返回：(摘要 HTML, 明细 HTML)
+    """
+    if metrics is not None:
+        with metrics.stage(STAGE_RENDER):
+            summary = generate_html_summary(session['stats'])
+            details = generate_html_details(session['results'], 1, DEFAULT_PAGE_SIZE, problems_only)
+        metrics.finish()
+    else:
+        summary = generate_html_summary(session['stats'])
+        details = generate_html_details(session['results'], 1, DEFAULT_PAGE_SIZE, problems_only)
+    
+    if show_metrics and session.get('metrics') is not None:
+        summary += render_metrics_footer(session['metrics'])
+    return summary, details
+
+def start_quality_check_handler(file, csv_file, problems_only, show_metrics, session, progress=None):
     """
     处理质检按钮点击事件
     参数：file - Gradio 上传的文本文件对象
           csv_file - Gradio 上传的 CSV 词库文件对象（可选）
-    返回：上传状态文本、质检结果文本、CSV 状态文本
+          problems_only - 明细是否只显示问题句
+          show_metrics - 是否在摘要下方显示各阶段耗时
+          session - 当前会话状态
+          progress - Gradio 进度条（可选，无界面调用时省略）
+    返回：上传状态文本、统计摘要、第 1 页明细、CSV 状态文本、页码、会话状态、成员名列表
     """
-    global current_check_result
+    session = session or new_session()
+    progress = progress or _no_progress
     
     if file is None:
-        return "请先上传文件", "请上传 TXT 文件后再开始质检", "未上传 CSV 词库"
+        return "请先上传文件", "请上传 TXT 文件后再开始质检", "", "未上传 CSV 词库", 1, session, []
+    
+    csv_status = f"使用 CSV 词库：{csv_file.name.split('/')[-1]}" if csv_file else "使用默认 TXT 词库"
+    file_status = f"已上传文件：{file.name.split('/')[-1]}"
     
     try:
         # 判断是否使用 CSV 词库
         csv_path = csv_file.name if csv_file is not None else None
         
-        # 调用质检核心逻辑（传入 CSV 路径）
-        current_check_result = start_quality_check(file.name, csv_path)
-        
-        # 生成 HTML 高亮报告
-        report = generate_html_report(current_check_result)
+        # 先取得本次生效的词库（已预编译或已缓存时不重新解析），
+        # 文本和词库版本都未变化时直接复用本会话上次的结果
+        metrics = RunMetrics(file.name.split('/')[-1])
+        progress(0, desc="加载词库")
+        matcher = load_matcher_timed(csv_path, metrics)
+        key = _input_key(file.name, matcher.version)
+        if key == session['key']:
+            metrics = None
+        else:
+            # 流式质检，统计随质检同步累加，并定期回报进度；
+            # 超大的普通文本分块并行，压缩包按成员边解压边质检
+            file_name = file.name.split('/')[-1]
+            if (not is_archive(file.name) and PARALLEL_MIN_MB > 0
+                    and os.path.getsize(file.name) >= PARALLEL_MIN_MB * 1024 * 1024):
+                stats = CheckStats()
+                members = [(None, stats, iter_parallel_quality_check(file.name, matcher, stats=stats, metrics=metrics))]
+            else:
+                members = iter_member_quality_check(file.name, matcher, metrics=metrics)
+            
+            checked_members = []
+            done = 0
+            for member, stats, results in members:
+                check_results = []
+                for result in results:
+                    check_results.append(result)
+                    done += 1
+                    if done % PROGRESS_EVERY == 0:
+                        progress((done, None), desc="逐句质检", unit="句")
+                checked_members.append((member or file_name, check_results, stats))
+            
+            _, check_results, stats = checked_members[0] if checked_members else (None, [], CheckStats())
+            session = {'key': key, 'results': check_results, 'stats': stats, 'metrics': metrics,
+                       'members': checked_members}
         
-        # 更新状态信息
-        file_status = f"已上传文件：{file.name.split('/')[-1]}"
-        csv_status = f"使用 CSV 词库：{csv_file.name.split('/')[-1]}" if csv_file else "使用默认 TXT 词库"
+        member_names = [name for name, _, _ in session['members']]
+        if not any(results for _, results, _ in session['members']):
+            if metrics is not None:
+                metrics.finish()
+            message = "文本内容为空，请检查上传文件" if member_names else "压缩包中没有 TXT 文件"
+            return file_status, f"<p>{message}</p>", "", csv_status, 1, session, member_names
         
-        return file_status, report, csv_status
+        # 摘要立即展示，明细只渲染第 1 页
+        summary, details = _render_session(session, problems_only, show_metrics, metrics)
+        return file_status, summary, details, csv_status, 1, session, member_names
     
     except Exception as e:
-        csv_status = f"使用 CSV 词库：{csv_file.name.split('/')[-1]}" if csv_file else "使用默认 TXT 词库"
-        return f"已上传文件：{file.name.split('/')[-1]}", f"质检出错：{str(e)}", csv_status
+        return file_status, f"质检出错：{str(e)}", "", csv_status, 1, new_session(), []
+
+def member_handler(member, problems_only, show_metrics, session):
+    """
+    切换压缩包中要查看的成员（不重新质检）
+    参数：member - 成员名
+          problems_only - 明细是否只显示问题句
+          show_metrics - 是否在摘要下方显示各阶段耗时
+          session - 当前会话状态
+    返回：统计摘要、第 1 页明细、页码、会话状态
+    """
+    if not session or not session['members']:
+        return "", "", 1, session
+    
+    for name, check_results, stats in session['members']:
+        if name == member:
+            session = dict(session, results=check_results, stats=stats)
+            break
+    if not session['results']:
+        return f"<p>{member} 内容为空</p>", "", 1, session
+    
+    summary, details = _render_session(session, problems_only, show_metrics)
+    return summary, details, 1, session
+
+# ========== 明细翻页处理函数 ==========
+def page_handler(page, problems_only, session):
+    """
+    按需渲染指定页的明细（不重新质检）
+    参数：page - 目标页码
+          problems_only - 是否只显示问题句
+          session - 当前会话状态
+    返回：明细 HTML、实际页码
+    """
+    if not session or not session['results']:
+        return "", 1
+    
+    check_results = session['results']
+    _, page, _, _ = paginate_results(check_results, page, DEFAULT_PAGE_SIZE, problems_only)
+    return generate_html_details(check_results, page, DEFAULT_PAGE_SIZE, problems_only), page
+
+def prev_page_handler(page, problems_only, session):
+    """上一页"""
+    return page_handler((page or 1) - 1, problems_only, session)
+
+def next_page_handler(page, problems_only, session):
+    """下一页"""
+    return page_handler((page or 1) + 1, problems_only, session)
+
+def problems_only_handler(problems_only, session):
+    """切换"仅显示问题句"后回到第 1 页"""
+    return page_handler(1, problems_only, session)
+
+# ========== 实时质检 ==========
+async def live_check_handler(port):
+    """
+    启动本地实时质检服务，并持续刷新最近结果（点击"停止"后关闭服务）
+    参数：port - 监听端口（只监听本机，ASR 客户端每行发送一句）
+    返回：异步生成器，逐次产出状态文本和最近结果 HTML
+    """
+    port = int(port or LIVE_DEFAULT_PORT)
+    try:
+        checker = LiveChecker()
+        server = await serve_live(checker, port)
+    except Exception as e:
+        yield f"实时质检启动失败：{str(e)}", ""
+        return
+    
+    try:
+        yield f"实时质检运行中：127.0.0.1:{port}（每行一句）", ""
+        shown = 0
+        while True:
+            await asyncio.sleep(LIVE_REFRESH_SECONDS)
+            if checker.stats.total == shown:
+                continue
+            shown = checker.stats.total
+            status = (f"实时质检运行中：127.0.0.1:{port}，已质检 {shown} 句，"
+                      f"最近单句延迟 {checker.last_latency_ms:.2f} ms")
+            # 最新的结果显示在最前面
+            yield status, generate_html_report(list(reversed(checker.recent)), checker.stats)
+    finally:
+        server.close()
+
+def live_stop_handler():
+    """停止实时质检后的状态文本"""
+    return "实时质检已停止"
+
+# ========== 运行指标查看 ==========
+def metrics_handler():
+    """
+    返回 Prometheus 文本格式的进程内累计指标
+    返回：指标文本
+    """
+    return registry.render_prometheus()
 
 # ========== 文件上传处理函数 ==========
 def file_upload_handler(file):
@@ -64,78 +264,206 @@ def csv_upload_handler(csv_file):
     return f"已上传 CSV 词库：{csv_file.name.split('/')[-1]}"
 
 # ========== Gradio 界面布局 ==========
-with gr.Blocks(title="白芨AI 视频通话文本质检小工具") as demo:
-    # 顶部标题栏
-    gr.Markdown(title)
+def build_demo():
+    """
+    构建 Gradio 界面（首次调用时才导入 gradio）
+    返回：gr.Blocks 应用
+    """
+    import gradio as gr
     
-    # 主体区域：左右布局
-    with gr.Row():
-        # 左侧：文本上传区
-        with gr.Column(scale=1):
-            gr.Markdown("#### 文本上传区")
-            file_input = gr.File(
-                label="上传视频通话文本记录（TXT 格式）",
-                file_types=[".txt"]
-            )
-            upload_status = gr.Textbox(
-                label="上传状态",
-                value="未上传文件",
-                interactive=False
-            )
-            
-            # ========== 新增：CSV 词库上传区 ==========
-            gr.Markdown("#### 违禁词库上传区（可选）")
-            gr.Markdown("*CSV 文件应包含 'Restricted words'（违规词）和 'Invalid Words'（无效词）列*")
-            
-            # CSV 模板下载按钮
-            download_template_btn = gr.File(
-                label="下载 CSV 模板",
-                value="Prohibited words.CSV",
-                interactive=False
-            )
+    def check_handler(file, csv_file, problems_only, show_metrics, session, progress=gr.Progress()):
+        """质检按钮事件（带 Gradio 进度条；压缩包含多个成员时显示成员选择框）"""
+        *outputs, member_names = start_quality_check_handler(file, csv_file, problems_only, show_metrics,
+                                                             session, progress)
+        member_update = gr.update(choices=member_names, value=member_names[0] if member_names else None,
+                                  visible=len(member_names) > 1)
+        return (*outputs, member_update)
+    
+    with gr.Blocks(title="白芨AI 视频通话文本质检小工具") as demo:
+        # 顶部标题栏
+        gr.Markdown(title)
+        
+        # 每个会话独立的质检结果，多人同时使用互不覆盖
+        session_state = gr.State(new_session())
+        
+        # 主体区域：左右布局
+        with gr.Row():
+            # 左侧：文本上传区
+            with gr.Column(scale=1):
+                gr.Markdown("#### 文本上传区")
+                file_input = gr.File(
+                    label="上传视频通话文本记录（TXT 格式，或 .gz / .zip 压缩包）",
+                    file_types=[".txt", ".gz", ".zip"]
+                )
+                upload_status = gr.Textbox(
+                    label="上传状态",
+                    value="未上传文件",
+                    interactive=False
+                )
+                
+                # ========== 新增：CSV 词库上传区 ==========
+                gr.Markdown("#### 违禁词库上传区（可选）")
+                gr.Markdown("*CSV 文件应包含 'Restricted words'（违规词）和 'Invalid Words'（无效词）列；"
+                            "可选 'Critical words'（严重违规）、'Minor words'（轻微问题）、'Exceptions'（例外词）列*")
+                
+                # CSV 模板下载按钮
+                download_template_btn = gr.File(
+                    label="下载 CSV 模板",
+                    value="Prohibited words.CSV",
+                    interactive=False
+                )
+                
+                csv_input = gr.File(
+                    label="可选：上传自定义违禁词列表（CSV 格式）",
+                    file_types=[".csv", ".CSV"]
+                )
+                csv_status = gr.Textbox(
+                    label="词库状态",
+                    value="未上传 CSV 词库（将使用默认词库）",
+                    interactive=False
+                )
             
-            csv_input = gr.File(
-                label="可选：上传自定义违禁词列表（CSV 格式）",
-                file_types=[".csv", ".CSV"]
-            )
-            csv_status = gr.Textbox(
-                label="词库状态",
-                value="未上传 CSV 词库（将使用默认词库）",
-                interactive=False
-            )
+            # 右侧：结果展示区（使用 HTML 组件支持颜色高亮）
+            with gr.Column(scale=2):
+                gr.Markdown("#### 质检结果展示")
+                # 压缩包含多个 TXT 时按成员分别查看结果
+                member_input = gr.Dropdown(label="压缩包成员", choices=[], visible=False)
+                result_output = gr.HTML(
+                    value="<p style='padding: 20px; text-align: center; color: #666;'>点击下方 \"开始质检\" 按钮，等待结果生成...</p>"
+                )
+                
+                # 明细分页区：摘要先展示，明细按页按需生成
+                with gr.Row():
+                    problems_only_input = gr.Checkbox(label="仅显示问题句", value=False)
+                    show_metrics_input = gr.Checkbox(label="显示耗时", value=False)
+                    prev_button = gr.Button("上一页", size="sm")
+                    page_input = gr.Number(label="页码", value=1, precision=0, minimum=1)
+                    next_button = gr.Button("下一页", size="sm")
+                detail_output = gr.HTML()
         
-        # 右侧：结果展示区（使用 HTML 组件支持颜色高亮）
-        with gr.Column(scale=2):
-            gr.Markdown("#### 质检结果展示")
-            result_output = gr.HTML(
-                value="<p style='padding: 20px; text-align: center; color: #666;'>点击下方 \"开始质检\" 按钮，等待结果生成...</p>"
-            )
-    
-    # 底部：开始质检按钮
-    check_button = gr.Button("开始质检", variant="primary", size="lg")
-    
-    # ========== 事件绑定 ==========
-    # 文本文件上传时更新状态
-    file_input.change(
-        fn=file_upload_handler,
-        inputs=[file_input],
-        outputs=[upload_status]
-    )
-    
-    # ========== 新增：CSV 词库上传时更新状态 ==========
-    csv_input.change(
-        fn=csv_upload_handler,
-        inputs=[csv_input],
-        outputs=[csv_status]
-    )
+        # 底部：开始质检按钮
+        check_button = gr.Button("开始质检", variant="primary", size="lg")
+        
+        # 运行指标（Prometheus 文本格式，也可通过 API 名 "metrics" 拉取）
+        with gr.Accordion("运行指标", open=False):
+            metrics_output = gr.Code(label="Prometheus 指标", language=None, interactive=False)
+            metrics_button = gr.Button("刷新指标", size="sm")
+        
+        # 实时质检：通话进行中逐行接收 ASR 文本，结果即时刷新
+        with gr.Accordion("实时质检", open=False):
+            with gr.Row():
+                live_port_input = gr.Number(label="监听端口（本机）", value=LIVE_DEFAULT_PORT, precision=0)
+                live_start_button = gr.Button("开始实时质检", variant="primary")
+                live_stop_button = gr.Button("停止")
+            live_status = gr.Textbox(label="实时状态", value="实时质检未启动", interactive=False)
+            live_output = gr.HTML()
+        
+        # ========== 事件绑定 ==========
+        # 文本文件上传时更新状态
+        file_input.change(
+            fn=file_upload_handler,
+            inputs=[file_input],
+            outputs=[upload_status],
+            concurrency_limit=None
+        )
+        
+        # ========== 新增：CSV 词库上传时更新状态 ==========
+        csv_input.change(
+            fn=csv_upload_handler,
+            inputs=[csv_input],
+            outputs=[csv_status],
+            concurrency_limit=None
+        )
+        
+        # 点击质检按钮时执行质检（新增 CSV 参数）
+        check_button.click(
+            fn=check_handler,
+            inputs=[file_input, csv_input, problems_only_input, show_metrics_input, session_state],
+            outputs=[upload_status, result_output, detail_output, csv_status, page_input, session_state, member_input],
+            concurrency_limit=CHECK_CONCURRENCY_LIMIT
+        )
+        
+        # 切换压缩包成员时只重新渲染，不重新质检
+        member_input.change(
+            fn=member_handler,
+            inputs=[member_input, problems_only_input, show_metrics_input, session_state],
+            outputs=[result_output, detail_output, page_input, session_state],
+            concurrency_limit=None
+        )
+        
+        # 翻页 / 切换筛选时只渲染对应页的明细
+        page_input.submit(
+            fn=page_handler,
+            inputs=[page_input, problems_only_input, session_state],
+            outputs=[detail_output, page_input],
+            concurrency_limit=None
+        )
+        prev_button.click(
+            fn=prev_page_handler,
+            inputs=[page_input, problems_only_input, session_state],
+            outputs=[detail_output, page_input],
+            concurrency_limit=None
+        )
+        next_button.click(
+            fn=next_page_handler,
+            inputs=[page_input, problems_only_input, session_state],
+            outputs=[detail_output, page_input],
+            concurrency_limit=None
+        )
+        problems_only_input.change(
+            fn=problems_only_handler,
+            inputs=[problems_only_input, session_state],
+            outputs=[detail_output, page_input],
+            concurrency_limit=None
+        )
+        
+        metrics_button.click(
+            fn=metrics_handler,
+            inputs=[],
+            outputs=[metrics_output],
+            api_name="metrics",
+            concurrency_limit=None
+        )
+        
+        live_event = live_start_button.click(
+            fn=live_check_handler,
+            inputs=[live_port_input],
+            outputs=[live_status, live_output],
+            concurrency_limit=None
+        )
+        live_stop_button.click(
+            fn=live_stop_handler,
+            inputs=[],
+            outputs=[live_status],
+            cancels=[live_event],
+            concurrency_limit=None
+        )
     
-    # 点击质检按钮时执行质检（新增 CSV 参数）
-    check_button.click(
-        fn=start_quality_check_handler,
-        inputs=[file_input, csv_input],
-        outputs=[upload_status, result_output, csv_status]
-    )
+    return demo
+
+_demo = None
+
+def __getattr__(name):
+    """按需构建 demo（兼容 `from app import demo` 和 gradio 热重载模式）"""
+    global _demo
+    if name == 'demo':
+        if _demo is None:
+            _demo = build_demo()
+        return _demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ========== 启动应用 ==========
-if __name__ == "__main__":
+def main() -> None:
+    """启动 Web 应用"""
+    # 每次质检输出一行结构化的耗时日志
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    
+    # 启动时预编译默认词库，并在后台监视 check_words.txt 的变化（热更新，无需重启）
+    start_lexicon_watcher()
+    demo = build_demo()
+    # 启用队列：质检任务受并发上限约束，排队中的请求会在界面上显示排队位置
+    demo.queue(max_size=QUEUE_MAX_SIZE)
     demo.launch(server_name="0.0.0.0", server_port=7860, share=False, inbrowser=True)
+
+if __name__ == "__main__":
+    main()
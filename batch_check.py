@@ -0,0 +1,313 @@
+"""
+模块 5：批量质检命令行工具
+功能：无界面批量质检整个目录（或通配符匹配）的 TXT 文本（也支持 .gz / .zip 压缩包，流式解压，
+      压缩包中的每个 TXT 单独出结果），词库只加载编译一次，文件分发到多进程并行质检，输出逐文件结果和汇总表
+用法：python batch_check.py 文本目录或通配符 [-o 输出目录] [-w 进程数] [--csv 词库.csv] [--jsonl] [--sqlite 结果.db]
+                            [--rollup 汇总.db [--date YYYY-MM-DD]]
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from typing import Dict, List, Tuple
+
+from corpus_rollup import CorpusRollup, FileTally
+from quality_check import CheckStats, format_result, iter_member_quality_check, load_matcher, sentence_cache
+from result_export import JsonlExporter, SqliteExporter, now_timestamp, tee_results
+from word_matcher import WordMatcher
+
+# 汇总表表头
+SUMMARY_FIELDS = ['文件', '总句子数', '合格句子数', '问题句子数', '严重违规句子数', '违规词句子数', '无效词句子数',
+                  '轻微问题句子数', '质检通过率', '状态']
+
+# ========== 工作进程：每个进程只接收一次已编译的匹配器 ==========
+_worker_matcher = None
+_worker_jsonl = False
+_worker_sqlite = None
+_worker_checked_at = None
+
+def _init_worker(matcher: WordMatcher, jsonl: bool = False, sqlite_path: str = None,
+                 checked_at: str = None) -> None:
+    """
+    工作进程初始化函数
+    参数：matcher - 主进程编译好的匹配器（每个进程只传输一次）
+          jsonl - 是否为每个文件额外导出 *.result.jsonl
+          sqlite_path - SQLite 结果库路径（可选，每个工作进程各自打开连接，按批提交）
+          checked_at - 本次批量质检的时间（所有工作进程写入同一个值，作为本次运行的标识）
+    """
+    global _worker_matcher, _worker_jsonl, _worker_sqlite, _worker_checked_at
+    _worker_matcher = matcher
+    _worker_jsonl = jsonl
+    _worker_checked_at = checked_at
+    _worker_sqlite = SqliteExporter(sqlite_path, checked_at=checked_at) if sqlite_path else None
+
+def _close_worker() -> None:
+    """关闭本进程的 SQLite 导出器（不启用进程池时由主进程调用）"""
+    global _worker_sqlite
+    if _worker_sqlite is not None:
+        _worker_sqlite.close()
+        _worker_sqlite = None
+
+def _member_result_path(result_path: str, member: str) -> str:
+    """
+    压缩包成员的结果文件名（如 bundle.result.txt 中的 a/b.txt 对应 bundle.a_b.result.txt）
+    参数：result_path - 压缩包的结果文件路径
+          member - 成员名（None 表示普通文本或 .gz，直接使用 result_path）
+    返回：结果文件路径
+    """
+    if member is None:
+        return result_path
+    stem = os.path.splitext(member.replace('/', '_'))[0]
+    return f"{result_path[:-len('.result.txt')]}.{stem}.result.txt"
+
+def check_file(text_path: str, result_path: str) -> List[Tuple[str, CheckStats, str, int, int, Dict[str, int]]]:
+    """
+    质检单个文件（.zip 压缩包中的每个 TXT 成员单独质检、单独出结果）
+    参数：text_path - 待质检文本路径
+          result_path - 结果文件路径
+    返回：每个成员一项 check_member 的返回值；成员名记为 "压缩包路径/成员名"
+          （压缩包无法打开或其中没有 TXT 时返回压缩包本身的一行失败记录）
+    """
+    file_results = []
+    try:
+        for member, _, results in iter_member_quality_check(text_path, _worker_matcher):
+            name = text_path if member is None else f"{text_path}/{member}"
+            file_results.append(check_member(name, results, _member_result_path(result_path, member)))
+    except Exception as e:
+        # 压缩包本身无法打开
+        file_results.append((text_path, CheckStats(), str(e), 0, 0, {}))
+    if not file_results:
+        file_results.append((text_path, CheckStats(), "压缩包中没有 TXT 文件", 0, 0, {}))
+    return file_results
+
+def check_member(name: str, results, result_path: str) -> Tuple[str, CheckStats, str, int, int, Dict[str, int]]:
+    """
+    质检单个文本（或压缩包成员），边质检边写出结果（内存占用与文件大小无关）
+    同一工作进程内的句子缓存跨文件复用，重复的话术句只匹配一次
+    参数：name - 文本名（写入汇总表和结构化导出）
+          results - 该文本的 CheckResult 生成器
+          result_path - 结果文件路径
+    返回：(文本名, 统计, 错误信息, 本文件句子缓存命中数, 未命中数, {问题词: 命中次数})，成功时错误信息为空字符串
+    """
+    tally = FileTally()
+    stats = tally.stats
+    hits_before, misses_before = sentence_cache.hits, sentence_cache.misses
+    jsonl_exporter = None
+    exporters = []
+    try:
+        # 结构化导出：JSONL 每个文件一份，SQLite 由本进程共用一个连接
+        if _worker_jsonl:
+            jsonl_exporter = JsonlExporter(f"{os.path.splitext(result_path)[0]}.jsonl", problems_only=True, append=False,
+                                           checked_at=_worker_checked_at)
+            exporters.append(jsonl_exporter)
+        if _worker_sqlite is not None:
+            exporters.append(_worker_sqlite)
+        
+        with open(result_path, 'w', encoding='utf-8') as f:
+            for result in tee_results(results, name, *exporters):
+                tally.add(result)
+                f.write(format_result(result))
+                f.write('\n')
+            
+            # 问题类型分布（严重违规、轻微问题只在出现时显示）
+            footer = [f"总句子数：{stats.total} 句", f"合格句子数：{stats.qualified} 句"]
+            if stats.critical:
+                footer.append(f"严重违规问题：{stats.critical} 句")
+            footer += [f"违规词问题：{stats.violation} 句", f"无效词问题：{stats.invalid} 句"]
+            if stats.minor:
+                footer.append(f"轻微问题：{stats.minor} 句")
+            footer.append(f"质检通过率：{stats.pass_rate:.2f}%")
+            f.write('=' * 50 + '\n')
+            f.write(' | '.join(footer) + '\n')
+        error = ''
+    
+    except Exception as e:
+        error = str(e)
+        # 中途失败：撤回该文本已导出的结构化结果，与汇总表中的失败状态保持一致
+        for exporter in exporters:
+            exporter.discard_file(name)
+    
+    finally:
+        if jsonl_exporter is not None:
+            jsonl_exporter.close()
+    
+    return (name, stats, error,
+            sentence_cache.hits - hits_before, sentence_cache.misses - misses_before, dict(tally.words))
+
+# ========== 文件收集 ==========
+def collect_text_files(inputs: List[str]) -> List[str]:
+    """
+    展开输入的目录和通配符，得到待质检的 TXT 文件列表（目录中的 .gz / .zip 压缩包一并收集）
+    参数：inputs - 目录、文件或通配符列表
+    返回：去重并排序后的文件路径列表
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in ('*.txt', '*.TXT', '*.gz', '*.GZ', '*.zip', '*.ZIP'):
+                paths.extend(glob.glob(os.path.join(item, pattern)))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            paths.extend(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(set(paths))
+
+def _result_paths(text_paths: List[str], output_dir: str) -> List[str]:
+    """
+    为每个文本分配结果文件名（同名文件自动加序号，避免互相覆盖）
+    参数：text_paths - 文本路径列表
+          output_dir - 输出目录
+    返回：结果文件路径列表（与 text_paths 一一对应）
+    """
+    used = {}
+    result_paths = []
+    for path in text_paths:
+        # a.txt.gz 与 a.txt 同样取 a 作为文件名
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if path.lower().endswith('.gz') and stem.lower().endswith('.txt'):
+            stem = stem[:-len('.txt')]
+        used[stem] = used.get(stem, 0) + 1
+        if used[stem] > 1:
+            stem = f"{stem}_{used[stem]}"
+        result_paths.append(os.path.join(output_dir, f"{stem}.result.txt"))
+    return result_paths
+
+# ========== 汇总输出 ==========
+def _summary_row(name: str, stats: CheckStats, status: str) -> list:
+    """生成汇总表的一行"""
+    return [name, stats.total, stats.qualified, stats.problem, stats.critical, stats.violation, stats.invalid,
+            stats.minor, f"{stats.pass_rate:.2f}%", status or '成功']
+
+def write_summary(summary_path: str, file_results: List[tuple]) -> CheckStats:
+    """
+    写出汇总表（CSV，带 BOM 方便 Excel 打开）
+    参数：summary_path - 汇总表路径
+          file_results - 逐文本（压缩包按成员展开）的 check_member 返回值列表
+    返回：全部文件的合计统计
+    """
+    total = CheckStats()
+    with open(summary_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_FIELDS)
+        for text_path, stats, error, _, _, _ in file_results:
+            writer.writerow(_summary_row(text_path, stats, error))
+            total.merge(stats)
+        writer.writerow(_summary_row('合计', total, ''))
+    return total
+
+# ========== 主流程 ==========
+def run_batch(text_paths: List[str], output_dir: str, csv_words_path: str = None,
+              workers: int = None, jsonl: bool = False, sqlite_path: str = None) -> List[tuple]:
+    """
+    批量质检
+    参数：text_paths - 待质检文本路径列表
+          output_dir - 输出目录（逐文件结果 + summary.csv）
+          csv_words_path - CSV 词库路径（可选，否则使用默认 TXT 词库）
+          workers - 工作进程数（默认等于 CPU 核数，1 表示不启用进程池）
+          jsonl - 是否为每个文件额外导出问题句 *.result.jsonl
+          sqlite_path - SQLite 结果库路径（可选，问题句的每个命中写入一行）
+    返回：逐文本的 check_member 返回值列表，顺序与输入一致（压缩包按成员展开）
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 1. 词库只加载、编译一次
+    matcher = load_matcher(csv_words_path)
+    result_paths = _result_paths(text_paths, output_dir)
+    workers = workers or os.cpu_count() or 1
+    checked_at = now_timestamp()
+    
+    # 2. 分发到进程池（每个任务只回传很小的统计对象）
+    if workers == 1 or len(text_paths) <= 1:
+        _init_worker(matcher, jsonl, sqlite_path, checked_at)
+        try:
+            per_file = [check_file(t, r) for t, r in zip(text_paths, result_paths)]
+        finally:
+            _close_worker()
+    else:
+        # 进程池只在多进程时导入（multiprocessing 的导入耗时与整个质检核心相当）
+        from concurrent.futures import ProcessPoolExecutor
+        
+        if sqlite_path:
+            # 主进程先建表建索引，避免多个工作进程同时建表
+            SqliteExporter(sqlite_path).close()
+        chunksize = max(1, len(text_paths) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(matcher, jsonl, sqlite_path, checked_at)) as executor:
+            per_file = list(executor.map(check_file, text_paths, result_paths, chunksize=chunksize))
+    file_results = [member_result for members in per_file for member_result in members]
+    
+    # 3. 写出汇总
+    write_summary(os.path.join(output_dir, 'summary.csv'), file_results)
+    return file_results
+
+def update_rollup(rollup_path: str, file_results: List[tuple], date: str = None) -> Tuple[int, float]:
+    """
+    把本次批量质检的结果叠加到语料汇总（只读写本次的文件，不重新扫描历史；失败的文件不计入）
+    文件按（绝对路径, 归属日期）区分，每天复用同一目录时不会覆盖之前日期的记录
+    参数：rollup_path - 汇总库路径（不存在时新建）
+          file_results - run_batch 的返回值
+          date - 归属日期 YYYY-MM-DD（默认当天）
+    返回：(汇总中的文件记录数, 总通过率)
+    """
+    with CorpusRollup(rollup_path) as rollup:
+        for text_path, stats, error, _, _, words in file_results:
+            if not error:
+                rollup.add_file(os.path.abspath(text_path), stats, words, date)
+        rollup.save()
+        return rollup.file_count(), rollup.pass_rate
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本批量质检（命令行）")
+    parser.add_argument('inputs', nargs='+', help="TXT / .gz / .zip 文件、目录或通配符（如 'data/**/*.txt'）")
+    parser.add_argument('-o', '--output', default='qc_results', help="输出目录（默认 qc_results）")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="工作进程数（默认等于 CPU 核数）")
+    parser.add_argument('--csv', dest='csv_words_path', default=None, help="CSV 词库路径（默认使用 check_words.txt）")
+    parser.add_argument('--jsonl', action='store_true', help="为每个文件额外导出问题句 *.result.jsonl")
+    parser.add_argument('--sqlite', dest='sqlite_path', default=None, help="把问题句的命中写入 SQLite 结果库（可多次累积）")
+    parser.add_argument('--rollup', dest='rollup_path', default=None, help="把本次结果叠加到语料汇总库（SQLite，增量更新）")
+    parser.add_argument('--date', default=None, help="本批文本在汇总中的归属日期 YYYY-MM-DD（默认当天）")
+    args = parser.parse_args(argv)
+    
+    text_paths = collect_text_files(args.inputs)
+    if not text_paths:
+        print("未找到待质检的 TXT 文件", file=sys.stderr)
+        return 1
+    
+    try:
+        file_results = run_batch(text_paths, args.output, args.csv_words_path, args.workers,
+                                 args.jsonl, args.sqlite_path)
+    except Exception as e:
+        print(f"批量质检出错：{str(e)}", file=sys.stderr)
+        return 1
+    
+    failed = [(path, error) for path, _, error, _, _, _ in file_results if error]
+    for path, error in failed:
+        print(f"质检失败：{path}：{error}", file=sys.stderr)
+    
+    total = CheckStats()
+    cache_hits = cache_misses = 0
+    for _, stats, _, hits, misses, _ in file_results:
+        total.merge(stats)
+        cache_hits += hits
+        cache_misses += misses
+    print(f"已质检 {len(file_results) - len(failed)}/{len(file_results)} 个文件，"
+          f"共 {total.total} 句，问题 {total.problem} 句，通过率 {total.pass_rate:.2f}%")
+    if cache_hits + cache_misses:
+        print(f"句子缓存命中率：{cache_hits / (cache_hits + cache_misses) * 100:.2f}%"
+              f"（命中 {cache_hits} 次，未命中 {cache_misses} 次）")
+    print(f"结果已写入：{os.path.abspath(args.output)}")
+    
+    if args.rollup_path:
+        try:
+            file_count, pass_rate = update_rollup(args.rollup_path, file_results, args.date)
+        except Exception as e:
+            print(f"语料汇总更新失败：{str(e)}", file=sys.stderr)
+            return 1
+        print(f"语料汇总已更新：{os.path.abspath(args.rollup_path)}（共 {file_count} 个文件记录，"
+              f"通过率 {pass_rate:.2f}%）")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+模块 7：性能基准测试
+功能：生成可复现的合成通话文本和词库，分阶段计时（词库加载、文本读取、匹配、报告生成），
+      并在全新解释器中测量各模块的导入耗时，结果写入 JSON 文件，便于不同版本之间对比性能回归
+用法：python benchmark.py [--lines 1000,100000] [--words 1000,50000] [--repeat 3] [-o bench_results.json]
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from quality_check import (
+    SentenceCache, build_matcher, check_sentence, iter_quality_check,
+    load_check_words, load_check_words_from_csv, load_uploaded_text,
+)
+from report_generator import generate_html_report, generate_simple_report
+
+# 合成文本使用的汉字范围（常用汉字区段）和说话人
+_CJK_START = 0x4E00
+_CJK_END = 0x62FF
+_SPEAKERS = ['张运营', '李经理', '客服', '客户']
+# 高频重复的话术句
+_SCRIPTED_LINES = ['嗯', '好的', '您好，很高兴为您服务', '请问还有什么可以帮您', '感谢您的来电，再见', '稍等，我帮您查一下']
+# 测量导入耗时的模块（批量工作进程、命令行工具和 Web 入口）
+IMPORT_MODULES = ['quality_check', 'report_generator', 'batch_check', 'parallel_check', 'http_api', 'app']
+
+# ========== 合成数据生成 ==========
+def _random_word(rng: random.Random, min_len: int = 2, max_len: int = 4) -> str:
+    """随机生成一个汉字词"""
+    return ''.join(chr(rng.randint(_CJK_START, _CJK_END)) for _ in range(rng.randint(min_len, max_len)))
+
+def generate_lexicon(word_count: int, seed: int = 0, invalid_ratio: float = 0.2) -> Tuple[List[str], List[str]]:
+    """
+    生成合成词库
+    参数：word_count - 词条总数
+          seed - 随机种子（相同种子生成相同词库）
+          invalid_ratio - 无效词占比
+    返回：(违规词列表, 无效词列表)
+    """
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < word_count:
+        words.add(_random_word(rng))
+    words = sorted(words)
+    rng.shuffle(words)
+    split = int(word_count * invalid_ratio)
+    return words[split:], words[:split]
+
+def write_lexicon_txt(path: str, violation_words: List[str], invalid_words: List[str]) -> None:
+    """按 check_words.txt 的格式写出词库"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"违规词：{','.join(violation_words)}；无效词：{','.join(invalid_words)}")
+
+def write_lexicon_csv(path: str, violation_words: List[str], invalid_words: List[str]) -> None:
+    """按 Prohibited words.CSV 的格式写出词库"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['No.', 'Restricted words', 'Invalid Words'])
+        for idx in range(max(len(violation_words), len(invalid_words))):
+            writer.writerow([
+                idx + 1,
+                violation_words[idx] if idx < len(violation_words) else '',
+                invalid_words[idx] if idx < len(invalid_words) else '',
+            ])
+
+def generate_transcript(path: str, line_count: int, violation_words: List[str], invalid_words: List[str],
+                        seed: int = 0, hit_ratio: float = 0.2, repeat_ratio: float = 0.3) -> None:
+    """
+    生成合成通话文本
+    参数：path - 输出路径
+          line_count - 行数
+          violation_words / invalid_words - 用于插入命中的词库
+          seed - 随机种子
+          hit_ratio - 含问题词的行占比
+          repeat_ratio - 重复话术行占比
+    """
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(line_count):
+            roll = rng.random()
+            if roll < repeat_ratio:
+                line = rng.choice(_SCRIPTED_LINES)
+            else:
+                line = ''.join(_random_word(rng, 1, 6) for _ in range(rng.randint(3, 10)))
+                if roll < repeat_ratio + hit_ratio:
+                    pool = violation_words if (rng.random() < 0.5 or not invalid_words) else invalid_words
+                    if pool:
+                        pos = rng.randint(0, len(line))
+                        line = line[:pos] + rng.choice(pool) + line[pos:]
+            f.write(f"{rng.choice(_SPEAKERS)}：{line}\n")
+
+# ========== 计时 ==========
+def time_stage(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    重复执行并计时
+    参数：func - 被测函数
+          repeat - 重复次数
+    返回：{'min': 最短秒数, 'median': 中位秒数, 'max': 最长秒数}
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings)}
+
+def run_case(workdir: str, line_count: int, word_count: int, repeat: int, seed: int) -> Dict[str, object]:
+    """
+    跑一组规模（行数 × 词条数）的各阶段计时
+    参数：workdir - 合成数据目录
+          line_count - 文本行数
+          word_count - 词条数
+          repeat - 每个阶段重复次数
+          seed - 随机种子
+    返回：该组规模的计时结果
+    """
+    violation_words, invalid_words = generate_lexicon(word_count, seed)
+    txt_path = os.path.join(workdir, f"words_{word_count}.txt")
+    csv_path = os.path.join(workdir, f"words_{word_count}.csv")
+    text_path = os.path.join(workdir, f"transcript_{line_count}_{word_count}.txt")
+    write_lexicon_txt(txt_path, violation_words, invalid_words)
+    write_lexicon_csv(csv_path, violation_words, invalid_words)
+    generate_transcript(text_path, line_count, violation_words, invalid_words, seed)
+    
+    matcher = build_matcher(violation_words, invalid_words)
+    sentences = load_uploaded_text(text_path)
+    results = list(iter_quality_check(text_path, matcher, cache=SentenceCache(max_entries=0)))
+    
+    def check_all():
+        for sentence in sentences:
+            check_sentence(sentence, matcher)
+    
+    stages = {
+        'lexicon_load_txt': time_stage(lambda: load_check_words(txt_path), repeat),
+        'lexicon_load_csv': time_stage(lambda: load_check_words_from_csv(csv_path), repeat),
+        'lexicon_compile': time_stage(lambda: build_matcher(violation_words, invalid_words), repeat),
+        'load_uploaded_text': time_stage(lambda: load_uploaded_text(text_path), repeat),
+        'check_sentence': time_stage(check_all, repeat),
+        'pipeline_cached': time_stage(lambda: list(iter_quality_check(text_path, matcher, cache=SentenceCache())), repeat),
+        'simple_report': time_stage(lambda: generate_simple_report(results), repeat),
+        'html_report': time_stage(lambda: generate_html_report(results), repeat),
+    }
+    match_seconds = stages['check_sentence']['median']
+    return {
+        'lines': line_count,
+        'words': word_count,
+        'problem_lines': sum(1 for result in results if not result.is_ok),
+        'lines_per_second': line_count / match_seconds if match_seconds > 0 else None,
+        'stages': stages,
+    }
+
+# ========== 导入耗时 ==========
+def _import_seconds(module: str) -> float:
+    """
+    在全新解释器中导入模块，用 -X importtime 读取该模块的累计导入耗时
+    参数：module - 模块名
+    返回：导入耗时（秒，不含解释器自身启动）
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败：{proc.stderr.strip().splitlines()[-1:]}")
+    for line in proc.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"未找到 {module} 的导入耗时")
+
+def _imports_gradio(module: str) -> bool:
+    """导入模块后 gradio 是否被一并导入（无界面入口应为 False）"""
+    code = f"import sys, {module}; sys.exit(1 if 'gradio' in sys.modules else 0)"
+    return subprocess.run([sys.executable, '-c', code], capture_output=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__))).returncode != 0
+
+def measure_imports(modules: List[str], repeat: int) -> Dict[str, object]:
+    """
+    测量各模块的冷启动导入耗时
+    参数：modules - 模块名列表
+          repeat - 每个模块测量次数（每次都是新进程）
+    返回：{模块名: {'min', 'median', 'max', 'imports_gradio'}}
+    """
+    results = {}
+    for module in modules:
+        timings = [_import_seconds(module) for _ in range(repeat)]
+        timing = {'min': min(timings), 'median': statistics.median(timings), 'max': max(timings),
+                  'imports_gradio': _imports_gradio(module)}
+        results[module] = timing
+    return results
+
+def _git_revision() -> str:
+    """当前代码版本（非 git 仓库时返回空字符串）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本质检 - 性能基准测试")
+    parser.add_argument('--lines', type=_int_list, default=[1000, 100000], help="文本行数，逗号分隔（默认 1000,100000）")
+    parser.add_argument('--words', type=_int_list, default=[1000, 10000], help="词条数，逗号分隔（默认 1000,10000）")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段重复次数（默认 3）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（默认 0）")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="结果文件（默认 bench_results.json）")
+    args = parser.parse_args(argv)
+    
+    imports = measure_imports(IMPORT_MODULES, max(1, args.repeat))
+    print("[导入耗时] " + ', '.join(f"{module} {timing['median'] * 1000:.1f}ms"
+                                 + (" (含 gradio)" if timing['imports_gradio'] else "")
+                                 for module, timing in imports.items()))
+    
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='qc_bench_') as workdir:
+        for word_count in args.words:
+            for line_count in args.lines:
+                case = run_case(workdir, line_count, word_count, max(1, args.repeat), args.seed)
+                cases.append(case)
+                stages = ', '.join(f"{name} {timing['median'] * 1000:.1f}ms" for name, timing in case['stages'].items())
+                print(f"[{line_count} 行 × {word_count} 词] {stages}")
+    
+    report = {
+        'revision': _git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'imports': imports,
+        'cases': cases,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"基准测试结果已写入：{os.path.abspath(args.output)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
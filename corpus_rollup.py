@@ -0,0 +1,258 @@
+"""
+模块 12：语料级汇总统计（增量更新）
+功能：跨文件累计问题词排行、逐文件通过率和按天的问题趋势，结果持久化到本地 SQLite；
+      每个文件按（文件, 归属日期）记一条，每天复用同一导出目录时历史记录不会被覆盖；
+      新一天的文本只需把新文件的统计叠加上去，只读写本次涉及的行，耗时与已汇总的历史规模无关；
+      同一文件在同一天重新质检时先减去旧的贡献再加上新的
+用法：python corpus_rollup.py rollup.db [--top 20] [--days 30]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from quality_check import CheckResult, CheckStats
+
+# 汇总库格式版本
+ROLLUP_FORMAT_VERSION = 2
+# 参与汇总的计数字段（与 CheckStats 一致）
+STAT_FIELDS = CheckStats.__slots__
+
+_COUNT_COLUMNS = ', '.join(f"{field} INTEGER NOT NULL" for field in STAT_FIELDS)
+# files / file_words：每个（文件, 日期）的计数，替换时据此减去旧的贡献
+# daily / words：按天和按词的累计值，查询时直接读取，不扫描逐文件记录
+ROLLUP_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (file TEXT NOT NULL, date TEXT NOT NULL, {_COUNT_COLUMNS}, PRIMARY KEY (file, date));
+CREATE TABLE IF NOT EXISTS file_words (
+    file TEXT NOT NULL, date TEXT NOT NULL, word TEXT NOT NULL, count INTEGER NOT NULL,
+    PRIMARY KEY (file, date, word)
+);
+CREATE TABLE IF NOT EXISTS daily (date TEXT PRIMARY KEY, {_COUNT_COLUMNS});
+CREATE TABLE IF NOT EXISTS words (word TEXT PRIMARY KEY, count INTEGER NOT NULL);
+"""
+
+def _pass_rate(counts: Dict[str, int]) -> float:
+    """由计数字典计算通过率（百分比）"""
+    total = counts.get('total', 0)
+    return (counts.get('qualified', 0) / total) * 100 if total > 0 else 0.0
+
+# ========== 单文件累加器 ==========
+class FileTally:
+    """
+    单个文件的统计累加器，随结果流逐条累加（问题词按命中次数计数）
+    属性：stats - 句子统计
+          words - {问题词: 命中次数}
+    """
+    
+    __slots__ = ('stats', 'words')
+    
+    def __init__(self):
+        self.stats = CheckStats()
+        self.words = Counter()
+    
+    def add(self, result: CheckResult) -> None:
+        """累加一条质检结果"""
+        self.stats.add(result)
+        for hit in result.hits:
+            self.words[hit[2]] += 1
+
+# ========== 语料汇总 ==========
+class CorpusRollup:
+    """
+    语料级汇总：问题词排行、按天趋势和逐文件统计，全部以计数形式增量维护
+    修改在 save() 时一次提交（一个事务），close() 前未保存的修改会被丢弃
+    参数：path - 汇总库文件路径（不存在时新建）
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self._conn = sqlite3.connect(path)
+            self._conn.executescript(ROLLUP_SCHEMA)
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('version', ?)", (str(ROLLUP_FORMAT_VERSION),))
+                self._conn.commit()
+            elif row[0] != str(ROLLUP_FORMAT_VERSION):
+                raise Exception(f"汇总库版本不兼容：{row[0]}")
+        except sqlite3.DatabaseError as e:
+            raise Exception(f"汇总库读取失败：{str(e)}")
+    
+    def add_file(self, file_name: str, stats: CheckStats, words: Dict[str, int], date: str = None) -> None:
+        """
+        叠加一个文件的统计（同一文件同一天已汇总过时先减去旧的贡献，其他日期的记录保留）
+        耗时只与本文件的问题词种类数有关，与已汇总的历史规模无关
+        参数：file_name - 文本文件
+              stats - 本文件的句子统计
+              words - 本文件的 {问题词: 命中次数}
+              date - 归属日期 YYYY-MM-DD（默认当天）
+        """
+        date = date or time.strftime('%Y-%m-%d')
+        self.remove_file(file_name, date)
+        
+        counts = [getattr(stats, field) for field in STAT_FIELDS]
+        words = [(word, count) for word, count in words.items() if count]
+        columns = ', '.join(STAT_FIELDS)
+        placeholders = ', '.join('?' * len(STAT_FIELDS))
+        self._conn.execute(f"INSERT INTO files (file, date, {columns}) VALUES (?, ?, {placeholders})",
+                           [file_name, date] + counts)
+        self._conn.executemany("INSERT INTO file_words (file, date, word, count) VALUES (?, ?, ?, ?)",
+                               [(file_name, date, word, count) for word, count in words])
+        
+        updates = ', '.join(f"{field} = {field} + excluded.{field}" for field in STAT_FIELDS)
+        self._conn.execute(f"INSERT INTO daily (date, {columns}) VALUES (?, {placeholders}) "
+                           f"ON CONFLICT (date) DO UPDATE SET {updates}", [date] + counts)
+        self._conn.executemany("INSERT INTO words (word, count) VALUES (?, ?) "
+                               "ON CONFLICT (word) DO UPDATE SET count = count + excluded.count", words)
+    
+    def add_tally(self, file_name: str, tally: FileTally, date: str = None) -> None:
+        """叠加一个 FileTally 累加器的结果"""
+        self.add_file(file_name, tally.stats, tally.words, date)
+    
+    def remove_file(self, file_name: str, date: str) -> bool:
+        """
+        减去一个文件在某一天的贡献
+        参数：file_name - 文本文件
+              date - 归属日期 YYYY-MM-DD
+        返回：该文件该日期此前是否已汇总
+        """
+        key = (file_name, date)
+        row = self._conn.execute(f"SELECT {', '.join(STAT_FIELDS)} FROM files WHERE file = ? AND date = ?",
+                                 key).fetchone()
+        if row is None:
+            return False
+        
+        updates = ', '.join(f"{field} = {field} - ?" for field in STAT_FIELDS)
+        self._conn.execute(f"UPDATE daily SET {updates} WHERE date = ?", list(row) + [date])
+        self._conn.execute("DELETE FROM daily WHERE date = ? AND total <= 0", (date,))
+        
+        old_words = self._conn.execute("SELECT count, word FROM file_words WHERE file = ? AND date = ?", key).fetchall()
+        self._conn.executemany("UPDATE words SET count = count - ? WHERE word = ?", old_words)
+        self._conn.executemany("DELETE FROM words WHERE word = ? AND count <= 0", [(word,) for _, word in old_words])
+        
+        self._conn.execute("DELETE FROM file_words WHERE file = ? AND date = ?", key)
+        self._conn.execute("DELETE FROM files WHERE file = ? AND date = ?", key)
+        return True
+    
+    # ========== 查询 ==========
+    @property
+    def totals(self) -> Dict[str, int]:
+        """全部文件的计数合计（由按天累计值求和）"""
+        sums = ', '.join(f"COALESCE(SUM({field}), 0)" for field in STAT_FIELDS)
+        row = self._conn.execute(f"SELECT {sums} FROM daily").fetchone()
+        return dict(zip(STAT_FIELDS, row))
+    
+    @property
+    def pass_rate(self) -> float:
+        """全部文件的质检通过率（百分比）"""
+        return _pass_rate(self.totals)
+    
+    def file_count(self) -> int:
+        """已汇总的（文件, 日期）记录数"""
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    
+    def top_words(self, n: int = 20) -> List[Tuple[str, int]]:
+        """
+        问题词排行
+        参数：n - 返回条数
+        返回：[(问题词, 命中次数), ...]，按命中次数从高到低
+        """
+        return self._conn.execute("SELECT word, count FROM words ORDER BY count DESC, word LIMIT ?", (n,)).fetchall()
+    
+    def file_pass_rates(self, n: int = None) -> List[Tuple[str, str, int, float]]:
+        """
+        逐文件通过率
+        参数：n - 返回条数（可选，默认全部）
+        返回：[(文件, 日期, 总句子数, 通过率), ...]，通过率从低到高（最需要关注的文件在前）
+        """
+        return self._conn.execute(
+            "SELECT file, date, total, CASE WHEN total > 0 THEN qualified * 100.0 / total ELSE 0.0 END AS rate "
+            "FROM files ORDER BY rate, file, date LIMIT ?", (-1 if n is None else n,)).fetchall()
+    
+    def daily_trend(self, days: int = None) -> List[Tuple[str, Dict[str, int], float]]:
+        """
+        按天的问题趋势
+        参数：days - 只返回最近若干天（可选）
+        返回：[(日期, 计数字典, 通过率), ...]，按日期从早到晚
+        """
+        rows = self._conn.execute(f"SELECT date, {', '.join(STAT_FIELDS)} FROM daily ORDER BY date DESC LIMIT ?",
+                                  (days or -1,)).fetchall()
+        trend = []
+        for row in reversed(rows):
+            counts = dict(zip(STAT_FIELDS, row[1:]))
+            trend.append((row[0], counts, _pass_rate(counts)))
+        return trend
+    
+    # ========== 持久化 ==========
+    def save(self) -> None:
+        """提交本次的全部修改（一个事务，写入中断不会损坏已有汇总）"""
+        self._conn.commit()
+    
+    def close(self) -> None:
+        """关闭汇总库（未 save 的修改被丢弃）"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def __enter__(self) -> 'CorpusRollup':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def format_rollup(rollup: CorpusRollup, top: int = 20, days: int = 30) -> str:
+    """
+    把汇总渲染成文本
+    参数：rollup - 语料汇总
+          top - 问题词排行条数
+          days - 趋势显示最近天数
+    返回：多行文本
+    """
+    totals = rollup.totals
+    lines = [
+        f"文件数：{rollup.file_count()} | 总句子数：{totals.get('total', 0)} | "
+        f"问题句子数：{totals.get('total', 0) - totals.get('qualified', 0)} | 通过率：{_pass_rate(totals):.2f}%",
+        "",
+        f"【问题词排行 Top {top}】",
+    ]
+    lines.extend(f"{idx}. {word}：{count} 次" for idx, (word, count) in enumerate(rollup.top_words(top), 1))
+    
+    lines.extend(["", f"【按天趋势（最近 {days} 天）】"])
+    for date, counts, pass_rate in rollup.daily_trend(days):
+        # 问题类型分布（严重违规、轻微问题只在出现时显示）
+        issues = [f"严重违规 {counts['critical']} 句"] if counts.get('critical') else []
+        issues += [f"违规词 {counts.get('violation', 0)} 句", f"无效词 {counts.get('invalid', 0)} 句"]
+        if counts.get('minor'):
+            issues.append(f"轻微问题 {counts['minor']} 句")
+        lines.append(f"{date}：{counts.get('total', 0)} 句，{'，'.join(issues)}，通过率 {pass_rate:.2f}%")
+    
+    lines.extend(["", f"【通过率最低的文件 Top {top}】"])
+    for name, date, total, pass_rate in rollup.file_pass_rates(top):
+        lines.append(f"{name}（{date}）：{total} 句，通过率 {pass_rate:.2f}%")
+    return '\n'.join(lines)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本质检 - 语料级汇总查看")
+    parser.add_argument('rollup_path', help="汇总库文件（由 batch_check.py --rollup 生成）")
+    parser.add_argument('--top', type=int, default=20, help="排行条数（默认 20）")
+    parser.add_argument('--days', type=int, default=30, help="趋势显示最近天数（默认 30）")
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.rollup_path):
+        print(f"汇总文件不存在：{args.rollup_path}", file=sys.stderr)
+        return 1
+    try:
+        with CorpusRollup(args.rollup_path) as rollup:
+            print(format_rollup(rollup, args.top, args.days))
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,455 @@
+"""
+模块 13：本地 JSON HTTP 接口
+功能：供其他服务以编程方式提交质检，一次请求可提交一个或多个文本，并可指定词库 ID；
+      词库在服务启动时预编译并常驻内存（默认词库随 check_words.txt 热更新），请求路径上不读取词库文件；
+      大批量请求以 NDJSON 分块传输逐批返回逐句结果，单个超长文本也不必等全部质检完成
+用法：python http_api.py [--port 8900] [--lexicon 客服=客服词库.csv ...]
+      curl -X POST http://127.0.0.1:8900/check -d '{"transcripts": [{"id": "call-1", "text": "..."}]}'
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, List, Tuple
+from urllib.parse import urlsplit
+
+import quality_check
+from quality_check import CheckStats, iter_check_sentences, load_matcher, split_text_lines, start_lexicon_watcher
+from result_export import result_to_dict, stats_to_dict
+from run_metrics import RunMetrics, registry
+from word_matcher import WordMatcher
+
+logger = logging.getLogger("quality_check.http_api")
+
+# 本地监听地址和端口
+API_HOST = "127.0.0.1"
+API_DEFAULT_PORT = int(os.environ.get("QC_API_PORT", "8900"))
+# 请求体上限（超出返回 413）
+MAX_BODY_BYTES = int(float(os.environ.get("QC_API_MAX_BODY_MB", "64")) * 1024 * 1024)
+# 请求体达到该大小时自动以 NDJSON 流式返回（客户端也可用 Accept 头或 "stream" 字段指定）
+STREAM_MIN_BYTES = int(float(os.environ.get("QC_API_STREAM_MIN_KB", "1024")) * 1024)
+# 流式返回时每个分块的目标字节数（攒够再写，减少系统调用）
+STREAM_CHUNK_BYTES = 64 * 1024
+# 流式返回时每行 NDJSON 最多包含的逐句结果数
+STREAM_BATCH_SENTENCES = 500
+# 默认词库 ID（check_words.txt）
+DEFAULT_LEXICON_ID = 'default'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+JSON_CONTENT_TYPE = 'application/json; charset=utf-8'
+
+class ApiError(Exception):
+    """
+    请求错误，直接以对应的 HTTP 状态码返回给客户端
+    参数：status - HTTP 状态码
+          message - 错误信息
+    """
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# ========== 常驻词库 ==========
+class LexiconRegistry:
+    """
+    服务端常驻的词库表：词库 ID -> 已编译的匹配器
+    默认词库（ID 为 default）始终可用，已启动热更新时直接取当前生效的版本；
+    其余 CSV 词库在注册时编译一次，之后的请求只做一次字典查找
+    """
+    
+    def __init__(self):
+        self._matchers = {}
+        self._lock = threading.Lock()
+    
+    def register(self, lexicon_id: str, csv_words_path: str) -> WordMatcher:
+        """
+        注册（或替换）一个 CSV 词库
+        参数：lexicon_id - 词库 ID（请求中的 lexicon 字段）
+              csv_words_path - CSV 词库路径
+        返回：编译好的匹配器
+        """
+        if lexicon_id == DEFAULT_LEXICON_ID:
+            raise Exception(f"词库 ID {DEFAULT_LEXICON_ID} 保留给默认词库")
+        if not os.path.exists(csv_words_path):
+            raise FileNotFoundError(f"词库文件不存在：{csv_words_path}")
+        matcher = load_matcher(csv_words_path)
+        with self._lock:
+            self._matchers[lexicon_id] = matcher
+        return matcher
+    
+    def get(self, lexicon_id: str = None) -> Tuple[str, WordMatcher]:
+        """
+        按 ID 取出匹配器
+        参数：lexicon_id - 词库 ID（为空时使用默认词库）
+        返回：(词库 ID, 匹配器)
+        异常：未知的词库 ID 抛出 ApiError(404)
+        """
+        lexicon_id = lexicon_id or DEFAULT_LEXICON_ID
+        if lexicon_id == DEFAULT_LEXICON_ID:
+            return lexicon_id, load_matcher()
+        matcher = self._matchers.get(lexicon_id)
+        if matcher is None:
+            raise ApiError(404, f"未知词库：{lexicon_id}")
+        return lexicon_id, matcher
+    
+    def describe(self) -> List[dict]:
+        """
+        列出全部词库
+        返回：[{'id', 'version', 'word_count'}, ...]
+        """
+        with self._lock:
+            entries = [(DEFAULT_LEXICON_ID, load_matcher())] + sorted(self._matchers.items())
+        return [{'id': lexicon_id, 'version': matcher.version, 'word_count': matcher.word_count}
+                for lexicon_id, matcher in entries]
+
+# ========== 请求解析与质检 ==========
+def parse_transcripts(payload: dict) -> List[Tuple[Any, str]]:
+    """
+    从请求体中取出待质检文本
+    支持单个文本 {"text": "..."}，或多个文本 {"transcripts": ["...", {"id": "call-1", "text": "..."}]}
+    参数：payload - 请求 JSON
+    返回：[(文本 ID, 文本内容), ...]；未指定 ID 时使用文本在列表中的序号（从 0 开始）
+    异常：格式错误抛出 ApiError(400)
+    """
+    if 'text' in payload:
+        items = [payload]
+    else:
+        items = payload.get('transcripts')
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, "请求须包含 text 字段或非空的 transcripts 列表")
+    
+    transcripts = []
+    for idx, item in enumerate(items):
+        if isinstance(item, str):
+            transcripts.append((idx, item))
+        elif isinstance(item, dict) and isinstance(item.get('text'), str):
+            transcripts.append((item.get('id', idx), item['text']))
+        else:
+            raise ApiError(400, f"第 {idx + 1} 个文本格式错误：应为字符串或含 text 字段的对象")
+    return transcripts
+
+def iter_transcript_results(text: str, matcher: WordMatcher, stats: CheckStats, problems_only: bool = False,
+                            metrics: RunMetrics = None) -> Iterator[dict]:
+    """
+    逐句质检一个文本（按行切句，规则与上传文件一致），边质检边产出结果
+    参数：text - 文本内容
+          matcher - 已编译的词库匹配器
+          stats - 统计计数器（边产出边累加，含未返回的无问题句）
+          problems_only - 是否只产出问题句
+          metrics - 运行指标（可选，同一请求的多个文本累加在一起）
+    返回：逐句结果字典生成器
+    """
+    sentences = (line for line in (raw.strip() for raw in split_text_lines(text)) if line)
+    for result in iter_check_sentences(sentences, matcher, stats, metrics=metrics):
+        if not (problems_only and result.is_ok):
+            yield result_to_dict(result)
+
+def check_transcript(transcript_id: Any, text: str, matcher: WordMatcher, problems_only: bool = False,
+                     metrics: RunMetrics = None) -> Tuple[dict, CheckStats]:
+    """
+    质检一个文本，一次返回全部结果
+    参数：transcript_id - 文本 ID
+          text / matcher / problems_only / metrics - 同 iter_transcript_results
+    返回：({'id', 'stats', 'results': [逐句结果, ...]}, 统计)
+    """
+    stats = CheckStats()
+    results = list(iter_transcript_results(text, matcher, stats, problems_only, metrics))
+    return {'id': transcript_id, 'stats': stats_to_dict(stats), 'results': results}, stats
+
+def iter_transcript_lines(transcript_id: Any, text: str, matcher: WordMatcher, stats: CheckStats,
+                          problems_only: bool = False, metrics: RunMetrics = None,
+                          batch_size: int = STREAM_BATCH_SENTENCES) -> Iterator[dict]:
+    """
+    流式质检一个文本：逐批产出逐句结果，最后产出该文本的统计（内存中只保留一批结果）
+    参数：transcript_id - 文本 ID
+          stats - 该文本的统计计数器
+          batch_size - 每批的结果数
+          text / matcher / problems_only / metrics - 同 iter_transcript_results
+    返回：{'id', 'results': [...]} ... {'id', 'stats'} 生成器
+    """
+    batch = []
+    for row in iter_transcript_results(text, matcher, stats, problems_only, metrics):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield {'id': transcript_id, 'results': batch}
+            batch = []
+    if batch:
+        yield {'id': transcript_id, 'results': batch}
+    yield {'id': transcript_id, 'stats': stats_to_dict(stats)}
+
+# ========== 请求计数（计入 Prometheus 指标） ==========
+_request_counts = {'requests': 0, 'errors': 0}
+_request_counts_lock = threading.Lock()
+
+def _count_request(status: int) -> None:
+    """累加一次接口请求（4xx / 5xx 计为错误）"""
+    with _request_counts_lock:
+        _request_counts['requests'] += 1
+        if status >= 400:
+            _request_counts['errors'] += 1
+
+def _api_metrics() -> list:
+    """导出接口请求计数（供 Prometheus 指标使用）"""
+    return [
+        ("qc_api_requests_total", "counter", "HTTP API requests handled.", _request_counts['requests']),
+        ("qc_api_request_errors_total", "counter", "HTTP API requests answered with 4xx/5xx.", _request_counts['errors']),
+    ]
+
+registry.add_collector(_api_metrics)
+
+# ========== HTTP 服务 ==========
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """
+    接口请求处理：
+    POST /check     - 质检一个或多个文本，返回 JSON（或 NDJSON 流）
+    GET  /lexicons  - 列出可用词库
+    GET  /metrics   - Prometheus 指标
+    GET  /health    - 存活检查
+    """
+    
+    # HTTP/1.1 长连接：客户端可在同一连接上连续发送请求，省去每次建连的开销
+    protocol_version = 'HTTP/1.1'
+    server_version = 'QualityCheckAPI/1.0'
+    # 响应头和响应体分两次写出，关闭 Nagle 算法避免长连接上的延迟确认等待
+    disable_nagle_algorithm = True
+    
+    def log_message(self, format: str, *args) -> None:
+        """访问日志降为 debug（高并发时逐条输出到 stderr 代价很高）"""
+        logger.debug("%s %s", self.address_string(), format % args)
+    
+    # ========== 路由 ==========
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif path == '/metrics':
+            self._send(200, registry.render_prometheus().encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/lexicons':
+            self._send_json(200, {'lexicons': self.server.lexicons.describe()})
+        else:
+            self._send_json(404, {'error': f"未知路径：{path}"})
+    
+    def do_POST(self) -> None:
+        path = urlsplit(self.path).path
+        if path != '/check':
+            self._discard_body()
+            self._send_json(404, {'error': f"未知路径：{path}"})
+            return
+        
+        self._streaming = False
+        try:
+            payload, body_size = self._read_json()
+            self._handle_check(payload, body_size)
+        except ApiError as e:
+            self._send_json(e.status, {'error': e.message})
+        except Exception as e:
+            logger.exception("质检接口出错")
+            if self._streaming:
+                # 流式响应已开始，无法再返回错误码，直接断开让客户端感知到不完整
+                self.close_connection = True
+                _count_request(500)
+            else:
+                self._send_json(500, {'error': f"质检过程出错：{str(e)}"})
+    
+    # ========== 质检 ==========
+    def _handle_check(self, payload: dict, body_size: int) -> None:
+        """
+        处理一次质检请求
+        参数：payload - 请求 JSON（lexicon、text / transcripts、problems_only、stream）
+              body_size - 请求体字节数（用于决定是否流式返回）
+        """
+        lexicon_id = payload.get('lexicon')
+        if lexicon_id is not None and not isinstance(lexicon_id, str):
+            raise ApiError(400, "lexicon 字段须为字符串")
+        lexicon_id, matcher = self.server.lexicons.get(lexicon_id)
+        transcripts = parse_transcripts(payload)
+        problems_only = bool(payload.get('problems_only', False))
+        stream = payload.get('stream')
+        if stream is None:
+            stream = NDJSON_CONTENT_TYPE in self.headers.get('Accept', '') or body_size >= STREAM_MIN_BYTES
+        stream = bool(stream)
+        
+        metrics = RunMetrics('http_api')
+        metrics.lexicon_size = matcher.word_count
+        total = CheckStats()
+        
+        summary = {'lexicon': lexicon_id, 'lexicon_version': matcher.version, 'transcripts': len(transcripts)}
+        if stream:
+            # 每个文本先是若干行逐句结果 {"id", "results"}，再是一行统计 {"id", "stats"}；
+            # 最后一行为汇总 {"summary": {...}}
+            def iter_lines() -> Iterator[bytes]:
+                for transcript_id, text in transcripts:
+                    stats = CheckStats()
+                    for line in iter_transcript_lines(transcript_id, text, matcher, stats, problems_only, metrics):
+                        yield _dump_json(line) + b'\n'
+                    total.merge(stats)
+                summary['stats'] = stats_to_dict(total)
+                yield _dump_json({'summary': summary}) + b'\n'
+            
+            self._send_chunked(iter_lines(), NDJSON_CONTENT_TYPE)
+        else:
+            rows = []
+            for transcript_id, text in transcripts:
+                row, stats = check_transcript(transcript_id, text, matcher, problems_only, metrics)
+                total.merge(stats)
+                rows.append(row)
+            summary['stats'] = stats_to_dict(total)
+            summary['results'] = rows
+            self._send_json(200, summary)
+        metrics.finish()
+    
+    # ========== 请求与响应 ==========
+    def _read_json(self) -> Tuple[dict, int]:
+        """
+        读取并解析 JSON 请求体
+        返回：(请求 JSON, 请求体字节数)
+        异常：缺少长度、超出上限或格式错误时抛出 ApiError
+        """
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self.close_connection = True
+            raise ApiError(411, "请求须带 Content-Length（不支持分块上传）")
+        try:
+            length = int(length)
+        except ValueError:
+            self.close_connection = True
+            raise ApiError(400, "Content-Length 格式错误")
+        if length > MAX_BODY_BYTES:
+            # 请求体未读取，连接上剩余的数据无法复用
+            self.close_connection = True
+            raise ApiError(413, f"请求体超过上限 {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        
+        body = self.rfile.read(length)
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise ApiError(400, f"JSON 格式错误：{str(e)}")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "请求体须为 JSON 对象")
+        return payload, length
+    
+    def _discard_body(self) -> None:
+        """丢弃未处理的请求体，使长连接上的下一个请求可以正常读取"""
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = 0
+        if 0 < length <= MAX_BODY_BYTES:
+            self.rfile.read(length)
+        elif length:
+            self.close_connection = True
+    
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        """发送完整响应（带 Content-Length，长连接可复用）"""
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        _count_request(status)
+    
+    def _send_json(self, status: int, data: dict) -> None:
+        """发送 JSON 响应"""
+        self._send(status, _dump_json(data), JSON_CONTENT_TYPE)
+    
+    def _send_chunked(self, chunks: Iterator[bytes], content_type: str) -> None:
+        """
+        以分块传输编码流式发送响应（边质检边发送，内存中只保留一个分块）
+        参数：chunks - 响应内容片段
+              content_type - 响应类型
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._streaming = True
+        
+        buffer = []
+        size = 0
+        for data in chunks:
+            buffer.append(data)
+            size += len(data)
+            if size >= STREAM_CHUNK_BYTES:
+                self._write_chunk(b''.join(buffer))
+                buffer = []
+                size = 0
+        if buffer:
+            self._write_chunk(b''.join(buffer))
+        self.wfile.write(b'0\r\n\r\n')
+        _count_request(200)
+    
+    def _write_chunk(self, data: bytes) -> None:
+        """写出一个分块"""
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+def _dump_json(data: Any) -> bytes:
+    """紧凑的 UTF-8 JSON（中文不转义）"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class ApiServer(ThreadingHTTPServer):
+    """
+    多线程 HTTP 服务（每个连接一个线程，所有线程共用常驻词库和句子缓存）
+    参数：address - (监听地址, 端口)
+          lexicons - 常驻词库表
+    """
+    
+    daemon_threads = True
+    # 加大监听队列，突发的大量连接不会被拒绝
+    request_queue_size = 128
+    
+    def __init__(self, address: Tuple[str, int], lexicons: LexiconRegistry):
+        super().__init__(address, ApiRequestHandler)
+        self.lexicons = lexicons
+
+def serve_api(port: int = API_DEFAULT_PORT, host: str = API_HOST, lexicons: LexiconRegistry = None) -> ApiServer:
+    """
+    创建接口服务（调用方负责 serve_forever / shutdown）
+    默认词库尚未预编译时在这里启动热更新监视，之后的请求不再读取词库文件
+    参数：port - 监听端口
+          host - 监听地址（默认只监听本机）
+          lexicons - 常驻词库表（可选，默认只有 default 词库）
+    返回：ApiServer
+    """
+    if quality_check.lexicon_watcher is None:
+        start_lexicon_watcher()
+    return ApiServer((host, port), lexicons or LexiconRegistry())
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本质检 - 本地 JSON HTTP 接口")
+    parser.add_argument('--host', default=API_HOST, help=f"监听地址（默认 {API_HOST}，只接受本机连接）")
+    parser.add_argument('--port', type=int, default=API_DEFAULT_PORT, help=f"监听端口（默认 {API_DEFAULT_PORT}）")
+    parser.add_argument('--lexicon', action='append', default=[], metavar='ID=CSV',
+                        help="注册 CSV 词库，请求中以 lexicon 字段指定 ID（可多次使用）")
+    args = parser.parse_args(argv)
+    
+    # 每次请求的耗时日志默认不输出（QC_API_LOG_LEVEL=INFO 开启）
+    logging.basicConfig(level=os.environ.get("QC_API_LOG_LEVEL", "WARNING").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    
+    lexicons = LexiconRegistry()
+    try:
+        for spec in args.lexicon:
+            lexicon_id, _, csv_words_path = spec.partition('=')
+            if not lexicon_id or not csv_words_path:
+                raise Exception(f"词库参数格式应为 ID=CSV 路径：{spec}")
+            lexicons.register(lexicon_id, csv_words_path)
+        server = serve_api(args.port, args.host, lexicons)
+    except Exception as e:
+        print(f"接口启动失败：{str(e)}", file=sys.stderr)
+        return 1
+    
+    print(f"质检接口已启动：http://{args.host}:{args.port}（POST /check，Ctrl+C 退出）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
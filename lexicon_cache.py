@@ -0,0 +1,218 @@
+"""
+模块 6：词库编译缓存
+功能：按词库文件内容的哈希缓存已编译的匹配器（LRU 淘汰），可选持久化到磁盘，
+      同一份词库重复质检时跳过解析和编译
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from word_matcher import WordMatcher
+
+# 磁盘缓存格式版本（WordMatcher 结构变化时递增，旧缓存文件自动失效）
+CACHE_FORMAT_VERSION = 3
+
+def file_digest(path: str) -> str:
+    """
+    计算文件内容的 SHA-256 哈希（分块读取）
+    参数：path - 文件路径
+    返回：十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class LexiconCache:
+    """
+    已编译词库匹配器的缓存
+    参数：max_entries - 内存中最多保留的词库数（超出时淘汰最久未使用的）
+          cache_dir - 磁盘缓存目录（可选，为空时只使用内存缓存）
+    """
+    
+    def __init__(self, max_entries: int = 16, cache_dir: Optional[str] = None):
+        self.max_entries = max(1, max_entries)
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, path: str, kind: str, build: Callable[[str], WordMatcher]) -> WordMatcher:
+        """
+        取出（或编译并缓存）词库文件对应的匹配器
+        参数：path - 词库文件路径
+              kind - 词库格式标识（如 'csv'、'txt'，不同格式的同一内容分开缓存）
+              build - 缓存未命中时调用的解析+编译函数，参数为词库路径
+        返回：WordMatcher 匹配器
+        """
+        key = f"{kind}-{file_digest(path)}"
+        
+        # 1. 内存缓存
+        with self._lock:
+            matcher = self._entries.get(key)
+            if matcher is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return matcher
+        
+        # 2. 磁盘缓存
+        matcher = self._load_from_disk(key)
+        if matcher is not None:
+            self.disk_hits += 1
+        else:
+            # 3. 解析并编译
+            self.misses += 1
+            matcher = build(path)
+            matcher.version = key
+            self._save_to_disk(key, matcher)
+        
+        with self._lock:
+            self._entries[key] = matcher
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return matcher
+    
+    def clear(self) -> None:
+        """清空内存缓存（磁盘缓存文件保留）"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    # ========== 磁盘持久化 ==========
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"lexicon-v{CACHE_FORMAT_VERSION}-{key}.pickle")
+    
+    def disk_file(self, key: str) -> Optional[str]:
+        """
+        磁盘缓存中某个词库的文件路径（可直接 pickle 加载）
+        参数：key - 词库版本（即匹配器的 version 属性）
+        返回：文件路径（未启用磁盘缓存或文件不存在时返回 None）
+        """
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        return path if os.path.exists(path) else None
+    
+    def _load_from_disk(self, key: str) -> Optional[WordMatcher]:
+        """读取磁盘上已编译的匹配器，不存在或损坏时返回 None"""
+        if not self.cache_dir:
+            return None
+        import pickle  # 只在启用磁盘缓存时导入，减少启动耗时
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                matcher = pickle.load(f)
+            return matcher if isinstance(matcher, WordMatcher) else None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, TypeError):
+            return None
+    
+    def _save_to_disk(self, key: str, matcher: WordMatcher) -> None:
+        """把编译好的匹配器写入磁盘（先写临时文件再原子替换，写入失败不影响质检）"""
+        if not self.cache_dir:
+            return
+        import pickle
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+# ========== 词库热更新 ==========
+class LexiconWatcher:
+    """
+    启动时预编译词库，之后在后台线程监视词库文件，变化时重新编译并原子替换匹配器
+    质检请求只读取 matcher 属性（一次引用赋值），进行中的质检继续使用旧匹配器，
+    新的质检使用新匹配器，请求路径上没有任何重新加载开销
+    参数：path - 词库文件路径
+          kind - 词库格式标识（与 LexiconCache.get 一致）
+          build - 解析+编译函数，参数为词库路径
+          cache - 词库缓存（可选，内容未变时直接复用已编译结果）
+          interval - 轮询间隔秒数
+    """
+    
+    def __init__(self, path: str, kind: str, build: Callable[[str], WordMatcher],
+                 cache: Optional[LexiconCache] = None, interval: float = 2.0):
+        self.path = path
+        self.kind = kind
+        self.build = build
+        self.cache = cache
+        self.interval = interval
+        self.reload_count = 0
+        self.last_error = ''
+        self._matcher = None
+        self._signature = None
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    @property
+    def matcher(self) -> WordMatcher:
+        """当前生效的匹配器"""
+        return self._matcher
+    
+    def _file_signature(self) -> tuple:
+        """文件的修改时间和大小（用于低成本地判断是否变化）"""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+    
+    def reload(self) -> bool:
+        """
+        立即重新编译词库并替换匹配器
+        返回：是否成功（失败时保留旧匹配器，错误信息记入 last_error）
+        """
+        try:
+            signature = self._file_signature()
+            if self.cache is not None:
+                matcher = self.cache.get(self.path, self.kind, self.build)
+            else:
+                matcher = self.build(self.path)
+                matcher.version = f"{self.kind}-{file_digest(self.path)}"
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+        
+        # 原子替换：之后开始的质检拿到新匹配器
+        self._matcher = matcher
+        self._signature = signature
+        self.reload_count += 1
+        self.last_error = ''
+        return True
+    
+    def start(self) -> 'LexiconWatcher':
+        """预编译词库并启动后台监视线程（预编译失败时抛出异常）"""
+        if not self.reload():
+            raise Exception(f"词库文件读取失败：{self.last_error}")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="lexicon-watcher", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """停止后台监视线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+    
+    def _watch(self) -> None:
+        """后台轮询：文件签名变化时在本线程内重新编译"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                signature = self._file_signature()
+            except OSError as e:
+                # 文件暂时不存在（例如编辑器先删后写），保留旧匹配器
+                self.last_error = str(e)
+                continue
+            if signature != self._signature:
+                self.reload()
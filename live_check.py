@@ -0,0 +1,240 @@
+"""
+模块 10：通话进行中的实时质检
+功能：词库常驻内存，逐行接收 ASR 文本（本地 socket 或 stdin 管道），每行立即产出结构化结果，
+      并维护运行统计和最近结果
+用法：python live_check.py --port 9900        # 本地 TCP，每行一句，逐行回写 JSON 结果
+      asr_client | python live_check.py --stdin   # 从管道读取，结果以 JSONL 输出到 stdout
+      python live_check.py --stdin < transcript.txt   # 回放录好的文本
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from typing import AsyncIterator, BinaryIO, Callable, List, Optional
+
+import quality_check
+from quality_check import CheckResult, CheckStats, load_matcher, sentence_cache
+from result_export import result_to_dict
+from word_matcher import WordMatcher
+
+# 单行最大字节数（超长行整行丢弃，避免单行拖慢整条流水线）
+MAX_LINE_BYTES = 64 * 1024
+# 本地监听地址（只接受本机连接）
+LIVE_HOST = "127.0.0.1"
+
+# ========== 增量质检器 ==========
+class LiveChecker:
+    """
+    增量质检器：每次接收一行文本，立即返回该行的质检结果
+    参数：csv_words_path - CSV 词库路径（可选，创建时编译一次后常驻内存）
+          matcher - 已编译的匹配器（可选，优先于 csv_words_path）
+          history - 保留的最近结果条数
+    说明：未指定词库且默认词库已启动热更新时，每行都读取当前生效的匹配器
+    """
+    
+    def __init__(self, csv_words_path: str = None, matcher: WordMatcher = None, history: int = 200):
+        if matcher is None and (csv_words_path or quality_check.lexicon_watcher is None):
+            matcher = load_matcher(csv_words_path)
+        self._matcher = matcher
+        self.stats = CheckStats()
+        self.recent = deque(maxlen=history)
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+    
+    @property
+    def matcher(self) -> WordMatcher:
+        """当前使用的匹配器"""
+        if self._matcher is not None:
+            return self._matcher
+        return quality_check.lexicon_watcher.matcher
+    
+    def check_line(self, line: str) -> Optional[CheckResult]:
+        """
+        质检一行文本
+        参数：line - 一行 ASR 文本
+        返回：CheckResult（空行返回 None）
+        """
+        started = time.perf_counter()
+        sentence = line.strip()
+        if not sentence:
+            return None
+        
+        issue_type, hits = sentence_cache.match(sentence, self.matcher)
+        result = CheckResult(self.stats.total + 1, sentence, issue_type, hits)
+        self.stats.add(result)
+        self.recent.append(result)
+        
+        self.last_latency_ms = (time.perf_counter() - started) * 1000
+        self.max_latency_ms = max(self.max_latency_ms, self.last_latency_ms)
+        return result
+    
+    def new_call(self) -> 'LiveChecker':
+        """
+        为一通新通话（一个连接）创建独立的质检器：共用匹配器，句子序号和统计各自从 1 开始
+        返回：LiveChecker
+        """
+        return LiveChecker(matcher=self._matcher, history=self.recent.maxlen)
+    
+    def record(self, result: CheckResult, latency_ms: float) -> None:
+        """
+        把某通通话产出的结果计入本质检器的汇总（结果的句子序号保持为该通话内的序号）
+        参数：result - 单句质检结果
+              latency_ms - 该句的质检延迟
+        """
+        self.stats.add(result)
+        self.recent.append(result)
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+# ========== 异步输入源 ==========
+async def _iter_stream_lines(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """
+    从异步输入流逐行读取，超过 MAX_LINE_BYTES 的行整行丢弃
+    超长行的后半段可能尚未到达，丢弃时一直读到该行的换行符为止，不会把残余部分当成新的一行
+    参数：reader - asyncio 输入流（limit 为 MAX_LINE_BYTES）
+    返回：行字节串异步生成器（输入流结束时结束）
+    """
+    discarding = False
+    while True:
+        try:
+            raw = await reader.readuntil(b'\n')
+        except asyncio.IncompleteReadError as e:
+            # 输入结束：最后一行可能没有换行符
+            raw = e.partial
+            if not raw or discarding:
+                break
+        except asyncio.LimitOverrunError as e:
+            # 超长行：丢弃已缓冲的部分，之后继续丢弃到换行符
+            await reader.readexactly(e.consumed)
+            discarding = True
+            continue
+        if discarding:
+            # 超长行的最后一段（含换行符）
+            discarding = False
+            continue
+        yield raw
+
+async def _iter_blocking_lines(stream: BinaryIO) -> AsyncIterator[bytes]:
+    """
+    在线程中逐行阻塞读取（用于无法作为管道异步读取的输入，如重定向自普通文件的 stdin），超长行同样整行丢弃
+    参数：stream - 二进制输入流
+    返回：行字节串异步生成器（输入结束时结束）
+    """
+    loop = asyncio.get_running_loop()
+    discarding = False
+    while True:
+        raw = await loop.run_in_executor(None, stream.readline, MAX_LINE_BYTES + 1)
+        if not raw:
+            break
+        complete = raw.endswith(b'\n')
+        if discarding or (not complete and len(raw) > MAX_LINE_BYTES):
+            # 超长行：一直丢弃到换行符
+            discarding = not complete
+            continue
+        yield raw
+
+async def _check_lines(lines: AsyncIterator[bytes], checker: LiveChecker) -> AsyncIterator[CheckResult]:
+    """逐行质检异步行输入，跳过空行"""
+    async for raw in lines:
+        result = checker.check_line(raw.decode('utf-8', errors='replace'))
+        if result is not None:
+            yield result
+
+async def iter_live_results(reader: asyncio.StreamReader, checker: LiveChecker) -> AsyncIterator[CheckResult]:
+    """
+    从异步输入流逐行读取并质检
+    参数：reader - asyncio 输入流（socket 连接或 stdin 管道）
+          checker - 增量质检器
+    返回：CheckResult 异步生成器（输入流结束时结束）
+    """
+    async for result in _check_lines(_iter_stream_lines(reader), checker):
+        yield result
+
+async def serve_live(checker: LiveChecker, port: int, host: str = LIVE_HOST,
+                     on_result: Callable[[CheckResult], None] = None) -> asyncio.AbstractServer:
+    """
+    启动本地 TCP 服务：客户端每发送一行，服务端立即回写一行 JSON 结果
+    每个连接（一通通话）使用独立的质检器，句子序号和统计互不干扰
+    参数：checker - 汇总质检器（提供匹配器，并汇总所有连接的统计和最近结果）
+          port - 监听端口
+          host - 监听地址（默认只监听本机）
+          on_result - 每产出一条结果时的回调（可选）
+    返回：asyncio 服务对象（调用方负责 close）
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        call = checker.new_call()
+        try:
+            async for result in iter_live_results(reader, call):
+                checker.record(result, call.last_latency_ms)
+                writer.write(json.dumps(result_to_dict(result), ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+                if on_result is not None:
+                    on_result(result)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    return await asyncio.start_server(handle, host, port, limit=MAX_LINE_BYTES)
+
+async def _stdin_lines() -> AsyncIterator[bytes]:
+    """
+    把标准输入包装成异步逐行输入
+    管道和终端直接异步读取；重定向自普通文件（如回放录好的文本：--stdin < transcript.txt）时
+    无法注册为管道，改为在线程中逐行读取
+    返回：行字节串异步生成器
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (ValueError, OSError, NotImplementedError):
+        return _iter_blocking_lines(sys.stdin.buffer)
+    return _iter_stream_lines(reader)
+
+async def _run_stdin(checker: LiveChecker) -> None:
+    """stdin 模式：逐行输出 JSONL 结果，输入结束后输出统计"""
+    lines = await _stdin_lines()
+    async for result in _check_lines(lines, checker):
+        print(json.dumps(result_to_dict(result), ensure_ascii=False), flush=True)
+
+async def _run_socket(checker: LiveChecker, port: int) -> None:
+    """socket 模式：一直运行直到被中断"""
+    server = await serve_live(checker, port)
+    print(f"实时质检已启动：{LIVE_HOST}:{port}（每行一句，Ctrl+C 退出）", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本质检 - 实时质检")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--stdin', action='store_true', help="从标准输入逐行读取")
+    source.add_argument('--port', type=int, help="监听本地 TCP 端口")
+    parser.add_argument('--csv', dest='csv_words_path', default=None, help="CSV 词库路径（默认使用 check_words.txt）")
+    args = parser.parse_args(argv)
+    
+    try:
+        checker = LiveChecker(args.csv_words_path)
+    except Exception as e:
+        print(f"词库加载失败：{str(e)}", file=sys.stderr)
+        return 1
+    
+    try:
+        asyncio.run(_run_stdin(checker) if args.stdin else _run_socket(checker, args.port))
+    except KeyboardInterrupt:
+        pass
+    
+    stats = checker.stats
+    # 问题类型分布（严重违规、轻微问题只在出现时显示）
+    counts = [f"严重违规 {stats.critical} 句"] if stats.critical else []
+    counts += [f"违规词 {stats.violation} 句", f"无效词 {stats.invalid} 句"]
+    if stats.minor:
+        counts.append(f"轻微问题 {stats.minor} 句")
+    print(f"共 {stats.total} 句，{'，'.join(counts)}，最大单句延迟 {checker.max_latency_ms:.2f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
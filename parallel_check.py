@@ -0,0 +1,330 @@
+"""
+模块 9：单个大文件的分块并行质检
+功能：内存映射（mmap）大文本，按行边界切成若干块，由多个工作进程并行匹配，
+      主进程按原始顺序合并结果并分配全局句子序号；
+      所有并行质检共用一个有上限的进程池（spawn 方式启动，不继承 Web 服务线程持有的锁）
+用法：python parallel_check.py 大文本.txt [-w 进程数] [--csv 词库.csv] [-o 结果.txt]
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Tuple
+
+from quality_check import (
+    CheckResult, CheckStats, SentenceCache, format_result, is_archive, iter_uploaded_text, lexicon_cache,
+    load_matcher, sentence_cache, split_text_lines,
+)
+from run_metrics import STAGE_MATCH, RunMetrics
+from word_matcher import CATEGORY_OK, Hit, WordMatcher
+
+# 每块的目标字节数（块数多于进程数，便于负载均衡）
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+# 共用进程池的进程数上限（默认等于 CPU 核数；Web 服务中多个并行质检同时进行时也不会超出）
+PARALLEL_WORKERS = int(os.environ.get("QC_PARALLEL_WORKERS", "0")) or os.cpu_count() or 1
+# 每个工作进程保留的已编译词库数（不同请求可能使用不同词库）
+WORKER_LEXICON_SLOTS = 4
+
+# 块内问题句：(块内句子序号, 问题类型, 命中元组)
+ChunkIssue = Tuple[int, str, Tuple[Hit, ...]]
+
+# ========== 按行边界切块 ==========
+def split_chunks(file_path: str, chunk_count: int) -> List[Tuple[int, int]]:
+    """
+    把文件按行边界切成若干字节区间（UTF-8 中 b'\\n' 不会出现在多字节字符内部；
+    切点都在 b'\\n' 之后，\\r\\n 不会被拆到两块）
+    参数：file_path - 文本文件路径
+          chunk_count - 期望的块数
+    返回：[(起始字节, 结束字节), ...]，首尾相接覆盖整个文件
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return []
+    
+    chunk_count = max(1, min(chunk_count, size))
+    step = size // chunk_count
+    chunks = []
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            target = start + step
+            if target >= size:
+                end = size
+            else:
+                newline = mm.find(b'\n', target)
+                end = size if newline < 0 else newline + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+# ========== 工作进程 ==========
+_worker_cache = None
+_worker_matchers = OrderedDict()
+
+def _init_worker() -> None:
+    """工作进程初始化函数：创建本进程自己的句子缓存"""
+    global _worker_cache
+    _worker_cache = SentenceCache(max_entries=sentence_cache.max_entries)
+
+def _get_worker_matcher(version: str, lexicon_path: str) -> WordMatcher:
+    """
+    取出本进程已加载的匹配器（按词库版本缓存，同一词库在每个进程中只从文件加载一次）
+    参数：version - 词库版本
+          lexicon_path - 主进程写出的词库文件（本进程尚未加载该版本时才读取）
+    返回：WordMatcher 匹配器
+    """
+    matcher = _worker_matchers.get(version)
+    if matcher is not None:
+        _worker_matchers.move_to_end(version)
+        return matcher
+    import pickle
+    with open(lexicon_path, 'rb') as f:
+        matcher = pickle.load(f)
+    _worker_matchers[version] = matcher
+    while len(_worker_matchers) > WORKER_LEXICON_SLOTS:
+        _worker_matchers.popitem(last=False)
+    return matcher
+
+def _check_chunk(file_path: str, start: int, end: int, lexicon: Tuple[str, str]) -> Tuple[int, List[ChunkIssue]]:
+    """
+    质检一个字节区间（切行规则与 iter_uploaded_text 保持一致）
+    为减少进程间传输，只回传问题句的匹配结果，句子原文由主进程顺序读取
+    参数：file_path - 文本文件路径
+          start / end - 字节区间
+          lexicon - (词库版本, 词库文件路径)
+    返回：(本块非空句子数, 问题句列表)
+    """
+    matcher = _get_worker_matcher(*lexicon)
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8')
+    
+    count = 0
+    issues = []
+    for line in split_text_lines(text):
+        sentence = line.strip()
+        if not sentence:
+            continue
+        issue_type, hits = _worker_cache.match(sentence, matcher)
+        if issue_type != CATEGORY_OK:
+            issues.append((count, issue_type, hits))
+        count += 1
+    return count, issues
+
+# ========== 词库分发 ==========
+# 词库版本 -> [文件路径, 使用中的并行质检数, 是否为临时文件]
+_lexicon_files = {}
+_lexicon_files_lock = threading.Lock()
+
+def _write_lexicon_file(matcher: WordMatcher) -> Tuple[str, bool]:
+    """
+    把匹配器写成文件供工作进程加载（启用了词库磁盘缓存且已有该版本时直接使用缓存文件）
+    参数：matcher - 已编译的匹配器
+    返回：(文件路径, 是否为临时文件)
+    """
+    cached = lexicon_cache.disk_file(matcher.version)
+    if cached is not None:
+        return cached, False
+    import pickle
+    path = os.path.join(tempfile.gettempdir(), f"qc-lexicon-{os.getpid()}-{matcher.version}.pickle")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return path, True
+
+def _acquire_lexicon_file(matcher: WordMatcher) -> str:
+    """
+    取得词库文件（同一词库版本只写一次，同时进行的并行质检共用）
+    参数：matcher - 已编译的匹配器
+    返回：文件路径
+    """
+    with _lexicon_files_lock:
+        entry = _lexicon_files.get(matcher.version)
+        if entry is None:
+            try:
+                path, temporary = _write_lexicon_file(matcher)
+            except OSError as e:
+                raise Exception(f"词库分发失败：{str(e)}")
+            entry = _lexicon_files[matcher.version] = [path, 0, temporary]
+        entry[1] += 1
+        return entry[0]
+
+def _release_lexicon_file(version: str) -> None:
+    """一次并行质检结束：该词库不再被使用时删除临时文件"""
+    with _lexicon_files_lock:
+        entry = _lexicon_files[version]
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del _lexicon_files[version]
+    if entry[2]:
+        try:
+            os.remove(entry[0])
+        except OSError:
+            pass
+
+# ========== 共用进程池 ==========
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+def get_executor(workers: int = None):
+    """
+    取出（首次调用时创建）共用进程池
+    以 spawn 方式启动工作进程：Web 服务是多线程的，fork 出的子进程可能继承其他线程正持有的锁而永久阻塞
+    参数：workers - 进程数（只在首次创建时生效，默认 PARALLEL_WORKERS）
+    返回：(ProcessPoolExecutor, 进程数)
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None:
+            # 进程池只在真正并行质检时导入（multiprocessing 的导入耗时与整个质检核心相当）
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            
+            _executor_workers = workers or PARALLEL_WORKERS
+            _executor = ProcessPoolExecutor(max_workers=_executor_workers, initializer=_init_worker,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor, _executor_workers
+
+def shutdown_executor() -> None:
+    """关闭共用进程池（下次并行质检时重新创建）"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _discard_executor(executor) -> None:
+    """进程池损坏（工作进程异常退出）时丢弃，下次调用重新创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+# ========== 主流程 ==========
+def iter_parallel_quality_check(file_path: str, matcher: WordMatcher, workers: int = None, stats: CheckStats = None,
+                                chunk_bytes: int = DEFAULT_CHUNK_BYTES, metrics: RunMetrics = None) -> Iterator[CheckResult]:
+    """
+    分块并行质检单个大文件，按原始顺序逐条产出结果（序号与顺序质检完全一致）
+    多个并行质检同时进行时共用同一个进程池，进程总数不超过池的上限
+    参数：file_path - 文本文件路径
+          matcher - 已编译的词库匹配器
+          workers - 工作进程数（只在首次创建共用进程池时生效，默认 PARALLEL_WORKERS）
+          stats - 统计计数器（可选，边产出边累加）
+          chunk_bytes - 每块的目标字节数
+          metrics - 运行指标（可选，读取 + 等待并行匹配的耗时计入匹配阶段）
+    返回：CheckResult 生成器
+    """
+    executor, workers = get_executor(workers)
+    try:
+        size = os.path.getsize(file_path)
+        chunk_count = max(workers * 4, size // max(1, chunk_bytes) + 1)
+        chunks = split_chunks(file_path, chunk_count)
+    except Exception as e:
+        raise Exception(f"文本文件读取失败：{str(e)}")
+    if not chunks:
+        return
+    
+    # 每块任务只携带词库版本和文件路径；匹配器由主进程写成文件（同一版本只写一次），
+    # 工作进程按版本缓存，只有尚未加载该版本的进程才读取文件
+    lexicon = (matcher.version, _acquire_lexicon_file(matcher))
+    
+    from concurrent.futures.process import BrokenProcessPool
+    clock = time.perf_counter
+    waited = 0.0
+    line_no = 0
+    try:
+        chunk_results = executor.map(_check_chunk, [file_path] * len(chunks), [start for start, _ in chunks],
+                                     [end for _, end in chunks], [lexicon] * len(chunks))
+        sentences = iter_uploaded_text(file_path)
+        for _ in chunks:
+            start = clock()
+            count, issues = next(chunk_results)
+            waited += clock() - start
+            
+            # 合并：按块内序号把问题句结果放回原位，其余句子为无问题
+            issue_iter = iter(issues)
+            next_issue = next(issue_iter, None)
+            for local_idx in range(count):
+                start = clock()
+                sentence = next(sentences)
+                waited += clock() - start
+                line_no += 1
+                if next_issue is not None and next_issue[0] == local_idx:
+                    result = CheckResult(line_no, sentence, next_issue[1], next_issue[2])
+                    next_issue = next(issue_iter, None)
+                else:
+                    result = CheckResult(line_no, sentence)
+                if stats is not None:
+                    stats.add(result)
+                yield result
+    except BrokenProcessPool as e:
+        _discard_executor(executor)
+        raise Exception(f"并行质检进程异常退出：{str(e)}")
+    finally:
+        _release_lexicon_file(matcher.version)
+        if metrics is not None:
+            metrics.add(STAGE_MATCH, waited)
+            metrics.lines += line_no
+
+def run_parallel_quality_check(file_path: str, csv_words_path: str = None, workers: int = None,
+                               stats: CheckStats = None) -> List[CheckResult]:
+    """
+    分块并行质检（支持 CSV 和 TXT 词库），返回结构化结果
+    参数：file_path - 文本文件路径
+          csv_words_path - CSV 词库文件路径（可选，优先使用）
+          workers - 工作进程数（只在首次创建共用进程池时生效，默认 PARALLEL_WORKERS）
+          stats - 统计计数器（可选）
+    返回：CheckResult 列表
+    """
+    matcher = load_matcher(csv_words_path)
+    return list(iter_parallel_quality_check(file_path, matcher, workers, stats))
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="白芨AI 视频通话文本质检 - 单个大文件分块并行质检")
+    parser.add_argument('text_path', help="待质检的 TXT 文件")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="工作进程数（默认等于 CPU 核数）")
+    parser.add_argument('--csv', dest='csv_words_path', default=None, help="CSV 词库路径（默认使用 check_words.txt）")
+    parser.add_argument('-o', '--output', default=None, help="逐句结果输出文件（默认只输出统计）")
+    args = parser.parse_args(argv)
+    
+    if is_archive(args.text_path):
+        # 压缩包无法按字节区间随机读取，只能顺序解压
+        print("压缩包不支持分块并行质检，请使用 batch_check.py", file=sys.stderr)
+        return 1
+    
+    stats = CheckStats()
+    started = time.perf_counter()
+    try:
+        matcher = load_matcher(args.csv_words_path)
+        results = iter_parallel_quality_check(args.text_path, matcher, args.workers, stats)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                for result in results:
+                    f.write(format_result(result))
+                    f.write('\n')
+        else:
+            for _ in results:
+                pass
+    except Exception as e:
+        print(f"质检过程出错：{str(e)}", file=sys.stderr)
+        return 1
+    
+    elapsed = time.perf_counter() - started
+    # 问题类型分布（严重违规、轻微问题只在出现时显示）
+    counts = [f"严重违规 {stats.critical} 句"] if stats.critical else []
+    counts += [f"违规词 {stats.violation} 句", f"无效词 {stats.invalid} 句"]
+    if stats.minor:
+        counts.append(f"轻微问题 {stats.minor} 句")
+    print(f"共 {stats.total} 句，{'，'.join(counts)}，通过率 {stats.pass_rate:.2f}%，耗时 {elapsed:.2f} 秒")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,19 +4,40 @@
 """
 
 import os
-import csv
-from typing import List, Tuple
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from lexicon_cache import LexiconCache, LexiconWatcher
+from run_metrics import STAGE_LEXICON, STAGE_MATCH, STAGE_READ, RunMetrics, registry
+from word_matcher import (
+    CATEGORY_ALLOW, CATEGORY_CRITICAL, CATEGORY_INVALID, CATEGORY_MINOR, CATEGORY_OK, CATEGORY_VIOLATION,
+    SEVERITY_TIERS, Hit, WordMatcher,
+)
+
+# CSV 词库列名关键字（不区分大小写，按顺序匹配，"严重违规"须先于"违规"判断）
+CSV_COLUMN_KEYWORDS = [
+    (CATEGORY_CRITICAL, ('critical', '严重')),
+    (CATEGORY_VIOLATION, ('restrict', '违规')),
+    (CATEGORY_INVALID, ('invalid', '无效')),
+    (CATEGORY_MINOR, ('minor', '轻微')),
+    (CATEGORY_ALLOW, ('exception', 'allow', '例外', '白名单')),
+]
 
 # ========== 新增：读取 CSV 格式词库 ==========
-def load_check_words_from_csv(csv_file_path: str) -> Tuple[List[str], List[str]]:
+def load_lexicon_from_csv(csv_file_path: str) -> Dict[str, List[str]]:
     """
-    从 CSV 文件读取违规/无效词库
+    从 CSV 文件读取分级词库
+    必需列：Restricted words（违规词）、Invalid Words（无效词）；
+    可选列：Critical words（严重违规）、Minor words（轻微问题）、Exceptions（例外词）
     参数：csv_file_path - CSV 文件路径
-    返回：(违规词列表, 无效词列表)
+    返回：{类别: 词列表}，包含全部严重等级和例外词（缺少的可选列为空列表）
     """
+    import csv  # 只在读取 CSV 词库时导入，减少启动耗时
+    
     try:
-        violation_words = []
-        invalid_words = []
+        lexicon = {category: [] for category in SEVERITY_TIERS + (CATEGORY_ALLOW,)}
         
         with open(csv_file_path, 'r', encoding='utf-8') as f:
             # 读取 CSV 文件
@@ -26,45 +47,50 @@ def load_check_words_from_csv(csv_file_path: str) -> Tuple[List[str], List[str]]
             if reader.fieldnames is None:
                 raise ValueError("CSV 文件为空")
             
-            # 查找包含 "Restricted" 和 "Invalid" 的列名（不区分大小写）
-            restricted_col = None
-            invalid_col = None
-            
+            # 按列名关键字确定每一列对应的类别（不区分大小写，每个类别取第一个匹配的列）
+            columns = {}
             for col in reader.fieldnames:
-                col_lower = col.lower()
-                if 'restrict' in col_lower or '违规' in col_lower:
-                    restricted_col = col
-                if 'invalid' in col_lower or '无效' in col_lower:
-                    invalid_col = col
+                col_lower = (col or '').lower()
+                for category, keywords in CSV_COLUMN_KEYWORDS:
+                    if any(keyword in col_lower for keyword in keywords):
+                        columns.setdefault(category, col)
+                        break
             
-            if not restricted_col or not invalid_col:
+            if CATEGORY_VIOLATION not in columns or CATEGORY_INVALID not in columns:
                 raise ValueError("CSV 格式错误，请确保包含违规词和无效词列")
             
-            # 读取每一行数据
+            # 读取每一行数据（用集合去重，避免大词库下列表查找的平方级开销）
+            seen = {category: set() for category in columns}
             for row in reader:
-                # 读取违规词
-                if restricted_col in row and row[restricted_col].strip():
-                    word = row[restricted_col].strip().rstrip(':：')  # 去除冒号
-                    if word and word not in violation_words:
-                        violation_words.append(word)
-                
-                # 读取无效词
-                if invalid_col in row and row[invalid_col].strip():
-                    word = row[invalid_col].strip()
-                    if word and word not in invalid_words:
-                        invalid_words.append(word)
+                for category, col in columns.items():
+                    value = row.get(col)
+                    if not value or not value.strip():
+                        continue
+                    word = value.strip().rstrip(':：')  # 去除冒号
+                    if word and word not in seen[category]:
+                        seen[category].add(word)
+                        lexicon[category].append(word)
         
-        return violation_words, invalid_words
+        return lexicon
     
     except Exception as e:
         raise Exception(f"CSV 文件读取失败：{str(e)}")
 
+def load_check_words_from_csv(csv_file_path: str) -> Tuple[List[str], List[str]]:
+    """
+    从 CSV 文件读取违规/无效词库（兼容旧接口，只返回两个基本等级）
+    参数：csv_file_path - CSV 文件路径
+    返回：(违规词列表, 无效词列表)
+    """
+    lexicon = load_lexicon_from_csv(csv_file_path)
+    return lexicon[CATEGORY_VIOLATION], lexicon[CATEGORY_INVALID]
+
 # ========== 第一步：读取词库文件 ==========
-def load_check_words(words_file_path: str = "check_words.txt") -> tuple:
+def load_lexicon(words_file_path: str = "check_words.txt") -> Dict[str, List[str]]:
     """
-    读取违规/无效词库文件
+    读取分级词库文件
     参数：words_file_path - 词库文件路径
-    返回：(违规词列表, 无效词列表)
+    返回：{类别: 词列表}，包含全部严重等级和例外词（文件中没有的段为空列表）
     """
     try:
         if not os.path.exists(words_file_path):
@@ -74,114 +100,563 @@ def load_check_words(words_file_path: str = "check_words.txt") -> tuple:
             content = f.read()
         
         # 解析词库格式：违规词：敏感词1,敏感词2；无效词：嗯，啊，重复
-        violation_words = []
-        invalid_words = []
+        # 可选段：严重违规：…；轻微问题：…；例外词：禁止吸烟,…
+        lexicon = {category: [] for category in SEVERITY_TIERS + (CATEGORY_ALLOW,)}
         
         lines = content.split('；')
         for line in lines:
             line = line.strip()
-            if line.startswith('违规词：'):
-                words_str = line.replace('违规词：', '').strip()
-                violation_words = [w.strip() for w in words_str.split(',') if w.strip()]
-            elif line.startswith('无效词：'):
-                words_str = line.replace('无效词：', '').strip()
-                invalid_words = [w.strip() for w in words_str.split(',') if w.strip()]
+            for category in lexicon:
+                prefix = f"{category}："
+                if line.startswith(prefix):
+                    words_str = line[len(prefix):].strip()
+                    lexicon[category] = [w.strip() for w in words_str.split(',') if w.strip()]
+                    break
         
-        return violation_words, invalid_words
+        return lexicon
     
     except FileNotFoundError as e:
         raise e
     except Exception as e:
         raise Exception(f"词库文件读取失败：{str(e)}")
 
+def load_check_words(words_file_path: str = "check_words.txt") -> tuple:
+    """
+    读取违规/无效词库文件（兼容旧接口，只返回两个基本等级）
+    参数：words_file_path - 词库文件路径
+    返回：(违规词列表, 无效词列表)
+    """
+    lexicon = load_lexicon(words_file_path)
+    return lexicon[CATEGORY_VIOLATION], lexicon[CATEGORY_INVALID]
+
 # ========== 第二步：读取用户上传的通话文本 ==========
-def load_uploaded_text(file_path: str) -> List[str]:
+# 支持直接质检的压缩格式（.gz 为单个文本，.zip 内可含多个文本）
+ARCHIVE_SUFFIXES = ('.gz', '.zip')
+
+def is_archive(file_path: str) -> bool:
+    """是否为 .gz / .zip 压缩文件"""
+    return file_path.lower().endswith(ARCHIVE_SUFFIXES)
+
+def _iter_lines(f) -> Iterator[str]:
+    """逐行读取已打开的文本流，去除首尾空白并跳过空行"""
+    for line in f:
+        line = line.strip()
+        if line:
+            yield line
+
+def split_text_lines(text: str) -> List[str]:
     """
-    读取上传的文本文件，按行分割
+    按通用换行规则切分已读入的文本（\\r\\n、\\r、\\n 都视为换行，与 iter_uploaded_text 读文件时一致）
+    参数：text - 文本内容
+    返回：行列表（未去除空白）
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+def iter_uploaded_text(file_path: str) -> Iterator[str]:
+    """
+    逐行惰性读取上传的文本文件（不会一次性读入整个文件；.gz 文件边解压边读取）
     参数：file_path - 上传文件路径
-    返回：句子列表
+    返回：句子生成器（已去除首尾空白，跳过空行）
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 按换行符分割成句子列表，过滤空行
-        sentences = [line.strip() for line in content.split('\n') if line.strip()]
-        return sentences
+        # 通用换行模式：\r\n、单独的 \r 和 \n 都断行
+        if file_path.lower().endswith('.gz'):
+            import gzip  # 只在读取压缩文件时导入
+            f = gzip.open(file_path, 'rt', encoding='utf-8')
+        else:
+            f = open(file_path, 'r', encoding='utf-8')
+        with f:
+            yield from _iter_lines(f)
     
     except Exception as e:
         raise Exception(f"文本文件读取失败：{str(e)}")
 
+def _zip_member_name(info) -> str:
+    """
+    压缩包成员的显示名称
+    未标记 UTF-8 的成员名按 cp437 解码（Windows 中文系统打包的文件名实际为 GBK），尝试还原中文
+    """
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+def _iter_zip_member(archive, info) -> Iterator[str]:
+    """逐行读取压缩包中的一个成员（按块解压，不解压到磁盘也不整体读入内存）"""
+    import io
+    try:
+        with archive.open(info) as raw, io.TextIOWrapper(raw, encoding='utf-8') as f:
+            yield from _iter_lines(f)
+    
+    except Exception as e:
+        raise Exception(f"压缩包成员 {_zip_member_name(info)} 读取失败：{str(e)}")
+
+def iter_text_members(file_path: str) -> Iterator[Tuple[Optional[str], Iterator[str]]]:
+    """
+    按成员逐个读取上传文件：普通文本和 .gz 只有一个成员，.zip 中的每个 TXT 文件各为一个成员
+    调用方须读完当前成员的句子后再取下一个成员
+    参数：file_path - 上传文件路径
+    返回：(成员名, 句子生成器) 生成器；非 .zip 文件的成员名为 None
+    """
+    if not file_path.lower().endswith('.zip'):
+        yield None, iter_uploaded_text(file_path)
+        return
+    
+    import zipfile  # 只在读取 .zip 时导入
+    try:
+        archive = zipfile.ZipFile(file_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        raise Exception(f"压缩包读取失败：{str(e)}")
+    
+    with archive:
+        for info in archive.infolist():
+            name = _zip_member_name(info)
+            # 只质检 TXT 成员，跳过目录和 macOS 打包产生的元数据文件
+            if info.is_dir() or not name.lower().endswith('.txt') or name.startswith('__MACOSX/'):
+                continue
+            yield name, _iter_zip_member(archive, info)
+
+def load_uploaded_text(file_path: str) -> List[str]:
+    """
+    读取上传的文本文件，按行分割
+    参数：file_path - 上传文件路径
+    返回：句子列表
+    """
+    return list(iter_uploaded_text(file_path))
+
 # ========== 第三步：质检逻辑（词库匹配 + AI 辅助） ==========
-def check_sentence(sentence: str, violation_words: List[str], invalid_words: List[str]) -> dict:
+def build_matcher(violation_words: List[str], invalid_words: List[str]) -> WordMatcher:
     """
-    检查单句是否包含问题词
-    参数：sentence - 待检查的句子
-          violation_words - 违规词列表
+    由违规/无效词库编译多模式匹配器（每份词库只需编译一次）
+    参数：violation_words - 违规词列表
           invalid_words - 无效词列表
-    返回：{'sentence': 句子, 'issue_type': 问题类型, 'issue_words': 问题词列表}
+    返回：WordMatcher 匹配器
+    """
+    return build_lexicon_matcher({CATEGORY_VIOLATION: violation_words, CATEGORY_INVALID: invalid_words})
+
+def build_lexicon_matcher(lexicon: Dict[str, List[str]]) -> WordMatcher:
+    """
+    由分级词库编译匹配器：全部严重等级和例外词编译进同一个自动机，每句仍只扫描一遍
+    参数：lexicon - {类别: 词列表}（load_lexicon / load_lexicon_from_csv 的返回值，缺少的类别视为空）
+    返回：WordMatcher 匹配器
+    """
+    return WordMatcher([(category, lexicon.get(category, [])) for category in SEVERITY_TIERS],
+                       allow_words=lexicon.get(CATEGORY_ALLOW, []))
+
+def _compile_csv_lexicon(csv_words_path: str) -> WordMatcher:
+    """解析 CSV 词库并编译匹配器（词库缓存未命中时调用）"""
+    return build_lexicon_matcher(load_lexicon_from_csv(csv_words_path))
+
+def _compile_txt_lexicon(words_file_path: str) -> WordMatcher:
+    """解析 TXT 词库并编译匹配器（词库缓存未命中时调用）"""
+    return build_lexicon_matcher(load_lexicon(words_file_path))
+
+# 进程内共享的词库缓存（按文件内容哈希命中，LRU 淘汰；设置 QC_LEXICON_CACHE_DIR 可持久化到磁盘）
+lexicon_cache = LexiconCache(
+    max_entries=int(os.environ.get("QC_LEXICON_CACHE_SIZE", "16")),
+    cache_dir=os.environ.get("QC_LEXICON_CACHE_DIR") or None
+)
+
+# 默认 TXT 词库的热更新监视器（由 start_lexicon_watcher 启动，未启动时为 None）
+lexicon_watcher = None
+
+def start_lexicon_watcher(words_file_path: str = "check_words.txt", interval: float = None) -> LexiconWatcher:
+    """
+    预编译默认词库并启动热更新监视（服务启动时调用一次）
+    词库文件变化后在后台重新编译并原子替换，请求路径上不再读取或解析词库
+    参数：words_file_path - 默认 TXT 词库路径
+          interval - 轮询间隔秒数（默认读取环境变量 QC_LEXICON_RELOAD_INTERVAL，缺省 2 秒）
+    返回：LexiconWatcher 监视器
+    """
+    global lexicon_watcher
+    if interval is None:
+        interval = float(os.environ.get("QC_LEXICON_RELOAD_INTERVAL", "2"))
+    if lexicon_watcher is not None:
+        lexicon_watcher.stop()
+    lexicon_watcher = LexiconWatcher(words_file_path, 'txt', _compile_txt_lexicon, lexicon_cache, interval).start()
+    return lexicon_watcher
+
+def load_matcher(csv_words_path: str = None, words_file_path: str = "check_words.txt") -> WordMatcher:
+    """
+    加载词库并编译匹配器（优先使用 CSV，否则使用默认 TXT）
+    同一内容的词库只解析、编译一次，之后直接从缓存取出；
+    默认词库已启动热更新监视时，直接返回当前生效的匹配器
+    参数：csv_words_path - CSV 词库文件路径（可选）
+          words_file_path - 默认 TXT 词库路径
+    返回：WordMatcher 匹配器
+    """
+    if csv_words_path and os.path.exists(csv_words_path):
+        # 使用用户上传的 CSV 词库
+        return lexicon_cache.get(csv_words_path, 'csv', _compile_csv_lexicon)
+    
+    # 使用默认的 TXT 词库（已预编译时直接取当前版本）
+    watcher = lexicon_watcher
+    if watcher is not None and watcher.path == words_file_path:
+        return watcher.matcher
+    
+    if not os.path.exists(words_file_path):
+        raise FileNotFoundError("请检查词库文件是否存在")
+    return lexicon_cache.get(words_file_path, 'txt', _compile_txt_lexicon)
+
+def match_sentence(sentence: str, matcher: WordMatcher) -> Tuple[str, Tuple[Hit, ...]]:
     """
-    result = {
+    扫描单句并按优先级确定问题类型（严重违规 > 违规词 > 无效词 > 轻微问题）
+    参数：sentence - 待检查的句子
+          matcher - 由 build_matcher 编译好的匹配器
+    返回：(问题类型, 该类型的命中元组，按起始位置排序)
+    """
+    hits = matcher.find_all(sentence)
+    if not hits:
+        return CATEGORY_OK, ()
+    
+    # 只保留优先级最高的类别的命中（例外词覆盖的命中已在扫描时去掉）
+    rank = matcher.rank
+    issue_type = min(hits, key=lambda hit: rank[hit[3]])[3]
+    return issue_type, tuple(sorted(hit for hit in hits if hit[3] == issue_type))
+
+# ========== 句子级结果缓存（重复句只匹配一次） ==========
+class SentenceCache:
+    """
+    按 (词库版本, 句子) 缓存匹配结果，LRU 淘汰
+    通话文本里的寒暄、话术、"嗯""好的"等重复句很多，命中缓存即可跳过匹配；
+    句子在读取时已去除首尾空白，命中位置依赖原文，因此以原句作为键
+    参数：max_entries - 最多缓存的句子数（0 表示关闭缓存）
+          max_sentence_length - 超过该长度的句子不进缓存（长句很少重复）
+    """
+    
+    def __init__(self, max_entries: int = 100000, max_sentence_length: int = 64):
+        self.max_entries = max_entries
+        self.max_sentence_length = max_sentence_length
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def match(self, sentence: str, matcher: WordMatcher) -> Tuple[str, Tuple[Hit, ...]]:
+        """
+        带缓存的 match_sentence
+        参数：sentence - 待检查的句子
+              matcher - 已编译的词库匹配器
+        返回：(问题类型, 该类型的命中元组)
+        """
+        if self.max_entries <= 0 or len(sentence) > self.max_sentence_length:
+            return match_sentence(sentence, matcher)
+        
+        key = (matcher.version, sentence)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        
+        cached = match_sentence(sentence, matcher)
+        with self._lock:
+            self._entries[key] = cached
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+    
+    @property
+    def hit_rate(self) -> float:
+        """缓存命中率（百分比）"""
+        lookups = self.hits + self.misses
+        return (self.hits / lookups) * 100 if lookups > 0 else 0.0
+    
+    def clear(self) -> None:
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# 进程内共享的句子缓存（同一文件内、批量质检的多个文件之间都能复用；QC_SENTENCE_CACHE_SIZE=0 关闭）
+sentence_cache = SentenceCache(max_entries=int(os.environ.get("QC_SENTENCE_CACHE_SIZE", "100000")))
+
+# 旧接口 check_sentence(句子, 违规词列表, 无效词列表) 最近一次编译的匹配器（同一份词库逐句调用时只编译一次）
+_legacy_matcher = (None, None)
+
+def check_sentence(sentence: str, matcher: Union[WordMatcher, List[str]], invalid_words: List[str] = None) -> dict:
+    """
+    检查单句是否包含问题词（一次扫描，按严重等级取优先级最高的类别）
+    参数：sentence - 待检查的句子
+          matcher - 由 build_matcher 编译好的匹配器；
+                    兼容旧接口：也可传入违规词列表，同时用 invalid_words 传入无效词列表
+          invalid_words - 无效词列表（仅旧接口使用）
+    返回：{'sentence': 句子, 'issue_type': 问题类型, 'issue_words': 问题词列表,
+           'hits': [(起始位置, 结束位置, 问题词, 类别), ...]}
+    """
+    if not isinstance(matcher, WordMatcher):
+        global _legacy_matcher
+        key = (tuple(matcher), tuple(invalid_words or ()))
+        cached_key, cached = _legacy_matcher
+        if cached_key != key:
+            cached = build_matcher(list(key[0]), list(key[1]))
+            _legacy_matcher = (key, cached)
+        matcher = cached
+    issue_type, hits = match_sentence(sentence, matcher)
+    return {
         'sentence': sentence,
-        'issue_type': '无问题',
-        'issue_words': []
+        'issue_type': issue_type,
+        'issue_words': list(dict.fromkeys(hit[2] for hit in hits)),
+        'hits': list(hits)
     }
+
+# ========== 结构化质检结果 ==========
+class CheckResult:
+    """
+    单句质检结果记录（报告生成器直接读取字段，无需再解析字符串）
+    属性：line_no - 句子序号（从 1 开始）
+          sentence - 句子原文
+          issue_type - 问题类型（无问题 / 严重违规 / 违规词 / 无效词 / 轻微问题）
+          hits - 该问题类型的命中元组 ((起始位置, 结束位置, 问题词, 类别), ...)
+    """
+    
+    __slots__ = ('line_no', 'sentence', 'issue_type', 'hits')
     
-    # 检查违规词
-    for word in violation_words:
-        if word in sentence:
-            result['issue_type'] = '违规词'
-            result['issue_words'].append(word)
+    def __init__(self, line_no: int, sentence: str, issue_type: str = CATEGORY_OK, hits: Tuple[Hit, ...] = ()):
+        self.line_no = line_no
+        self.sentence = sentence
+        self.issue_type = issue_type
+        self.hits = hits
     
-    # 如果没有违规词，再检查无效词
-    if result['issue_type'] == '无问题':
-        for word in invalid_words:
-            if word in sentence:
-                result['issue_type'] = '无效词'
-                result['issue_words'].append(word)
+    @property
+    def is_ok(self) -> bool:
+        """是否为合格句子"""
+        return self.issue_type == CATEGORY_OK
     
-    return result
+    @property
+    def issue_words(self) -> List[str]:
+        """去重后的问题词列表（按首次出现的位置排序）"""
+        return list(dict.fromkeys(hit[2] for hit in self.hits))
+    
+    def __repr__(self) -> str:
+        return f"CheckResult(line_no={self.line_no!r}, issue_type={self.issue_type!r}, hits={self.hits!r})"
+
+def format_result(result: CheckResult) -> str:
+    """
+    把结构化结果渲染成文本行（兼容旧版字符串格式）
+    参数：result - 单句质检结果
+    返回：如 "N. 句子：… | 问题：违规词 | 问题词：…"
+    """
+    if result.is_ok:
+        return f"{result.line_no}. 句子：{result.sentence} | 问题：无问题"
+    issue_words_str = '、'.join(result.issue_words)
+    return f"{result.line_no}. 句子：{result.sentence} | 问题：{result.issue_type} | 问题词：{issue_words_str}"
+
+# ========== 质检统计（边质检边累加） ==========
+class CheckStats:
+    """
+    质检统计计数器，随结果流逐条累加，内存占用与文本大小无关
+    属性：total - 总句子数
+          qualified - 合格句子数
+          critical - 严重违规句子数
+          violation - 违规词句子数
+          invalid - 无效词句子数
+          minor - 轻微问题句子数
+    """
+    
+    __slots__ = ('total', 'qualified', 'critical', 'violation', 'invalid', 'minor')
+    
+    def __init__(self):
+        self.total = 0
+        self.qualified = 0
+        self.critical = 0
+        self.violation = 0
+        self.invalid = 0
+        self.minor = 0
+    
+    def add(self, result: CheckResult) -> None:
+        """累加一条质检结果"""
+        self.total += 1
+        if result.issue_type == CATEGORY_OK:
+            self.qualified += 1
+        elif result.issue_type == CATEGORY_VIOLATION:
+            self.violation += 1
+        elif result.issue_type == CATEGORY_INVALID:
+            self.invalid += 1
+        elif result.issue_type == CATEGORY_CRITICAL:
+            self.critical += 1
+        elif result.issue_type == CATEGORY_MINOR:
+            self.minor += 1
+    
+    def merge(self, other: 'CheckStats') -> None:
+        """合并另一份统计（用于多文件汇总）"""
+        self.total += other.total
+        self.qualified += other.qualified
+        self.critical += other.critical
+        self.violation += other.violation
+        self.invalid += other.invalid
+        self.minor += other.minor
+    
+    @classmethod
+    def from_results(cls, check_results: Iterable[CheckResult]) -> 'CheckStats':
+        """由已有结果一次性统计"""
+        stats = cls()
+        for result in check_results:
+            stats.add(result)
+        return stats
+    
+    @property
+    def problem(self) -> int:
+        """问题句子数"""
+        return self.total - self.qualified
+    
+    @property
+    def pass_rate(self) -> float:
+        """质检通过率（百分比）"""
+        return (self.qualified / self.total) * 100 if self.total > 0 else 0.0
+    
+    def __repr__(self) -> str:
+        return (f"CheckStats(total={self.total}, qualified={self.qualified}, critical={self.critical}, "
+                f"violation={self.violation}, invalid={self.invalid}, minor={self.minor})")
 
 # ========== 第四步：主质检函数（新增 CSV 支持） ==========
+def iter_quality_check(uploaded_text_path: str, matcher: WordMatcher, stats: CheckStats = None,
+                       cache: SentenceCache = None, metrics: RunMetrics = None) -> Iterator[CheckResult]:
+    """
+    流式质检：逐行读取、逐行检查、逐条产出结果
+    参数：uploaded_text_path - 上传文件的路径（.gz 边解压边质检；.zip 请使用 iter_member_quality_check）
+          matcher - 已编译的词库匹配器
+          stats - 统计计数器（可选，边产出边累加）
+          cache - 句子级结果缓存（可选，默认使用进程内共享的 sentence_cache）
+          metrics - 运行指标（可选，分别累计文本读取和匹配耗时，不含调用方处理结果的时间）
+    返回：CheckResult 生成器
+    """
+    return iter_check_sentences(iter_uploaded_text(uploaded_text_path), matcher, stats, cache, metrics)
+
+def iter_member_quality_check(uploaded_text_path: str, matcher: WordMatcher, cache: SentenceCache = None,
+                              metrics: RunMetrics = None) -> Iterator[Tuple[Optional[str], CheckStats, Iterator[CheckResult]]]:
+    """
+    按成员流式质检（普通文本、.gz、.zip 通用），每个成员单独编号、单独统计
+    调用方须读完当前成员的结果后再取下一个成员
+    参数：uploaded_text_path - 上传文件的路径
+          matcher - 已编译的词库匹配器
+          cache - 句子级结果缓存（可选）
+          metrics - 运行指标（可选，所有成员的耗时累加在一起）
+    返回：(成员名, 该成员的统计, 该成员的 CheckResult 生成器) 生成器；非 .zip 文件的成员名为 None
+    """
+    for member, sentences in iter_text_members(uploaded_text_path):
+        stats = CheckStats()
+        yield member, stats, iter_check_sentences(sentences, matcher, stats, cache, metrics)
+
+def iter_check_sentences(sentences: Iterable[str], matcher: WordMatcher, stats: CheckStats = None,
+                         cache: SentenceCache = None, metrics: RunMetrics = None) -> Iterator[CheckResult]:
+    """
+    逐句检查任意句子流（iter_quality_check 等的公共实现）
+    参数：sentences - 句子流（已去除首尾空白、跳过空行）
+          matcher / stats / cache / metrics - 同 iter_quality_check
+    返回：CheckResult 生成器
+    """
+    cache = cache if cache is not None else sentence_cache
+    
+    if metrics is None:
+        for idx, sentence in enumerate(sentences, 1):
+            issue_type, hits = cache.match(sentence, matcher)
+            result = CheckResult(idx, sentence, issue_type, hits)
+            if stats is not None:
+                stats.add(result)
+            yield result
+        return
+    
+    # 带计时的版本：耗时先累加到局部变量，结束时一次写入 metrics
+    clock = time.perf_counter
+    sentences = iter(sentences)
+    read_seconds = 0.0
+    match_seconds = 0.0
+    idx = 0
+    try:
+        while True:
+            start = clock()
+            sentence = next(sentences, None)
+            read_done = clock()
+            read_seconds += read_done - start
+            if sentence is None:
+                break
+            
+            issue_type, hits = cache.match(sentence, matcher)
+            match_seconds += clock() - read_done
+            
+            idx += 1
+            result = CheckResult(idx, sentence, issue_type, hits)
+            if stats is not None:
+                stats.add(result)
+            yield result
+    finally:
+        metrics.add(STAGE_READ, read_seconds)
+        metrics.add(STAGE_MATCH, match_seconds)
+        metrics.lines += idx
+
+def load_matcher_timed(csv_words_path: str = None, metrics: RunMetrics = None) -> WordMatcher:
+    """
+    带计时的 load_matcher，并记录词库规模
+    参数：csv_words_path - CSV 词库文件路径（可选）
+          metrics - 运行指标（可选）
+    返回：WordMatcher 匹配器
+    """
+    if metrics is None:
+        return load_matcher(csv_words_path)
+    with metrics.stage(STAGE_LEXICON):
+        matcher = load_matcher(csv_words_path)
+    metrics.lexicon_size = matcher.word_count
+    return matcher
+
+def run_quality_check(uploaded_text_path: str, csv_words_path: str = None, stats: CheckStats = None,
+                      metrics: RunMetrics = None) -> List[CheckResult]:
+    """
+    核心质检函数（支持 CSV 和 TXT 词库），返回结构化结果
+    参数：uploaded_text_path - 上传文件的路径
+          csv_words_path - CSV 词库文件路径（可选，优先使用）
+          stats - 统计计数器（可选，质检时顺带累加）
+          metrics - 运行指标（可选，记录各阶段耗时）
+    返回：CheckResult 列表（文本为空时返回空列表）
+    异常：词库或文本读取失败时抛出异常
+    """
+    # 1. 加载词库（优先使用 CSV，否则使用默认 TXT）
+    matcher = load_matcher_timed(csv_words_path, metrics)
+    
+    # 2. 流式读取并逐句质检
+    return list(iter_quality_check(uploaded_text_path, matcher, stats, metrics=metrics))
+
 def start_quality_check(uploaded_text_path: str, csv_words_path: str = None) -> List[str]:
     """
-    核心质检函数（支持 CSV 和 TXT 词库）
+    核心质检函数（支持 CSV 和 TXT 词库），返回格式化字符串
     参数：uploaded_text_path - 上传文件的路径
           csv_words_path - CSV 词库文件路径（可选，优先使用）
     返回：质检结果列表
     """
     try:
-        # 1. 加载词库（优先使用 CSV，否则使用默认 TXT）
-        if csv_words_path and os.path.exists(csv_words_path):
-            # 使用用户上传的 CSV 词库
-            violation_words, invalid_words = load_check_words_from_csv(csv_words_path)
-        else:
-            # 使用默认的 TXT 词库
-            violation_words, invalid_words = load_check_words()
-        
-        # 2. 读取上传文本
-        sentences = load_uploaded_text(uploaded_text_path)
+        metrics = RunMetrics(uploaded_text_path)
+        check_results = run_quality_check(uploaded_text_path, csv_words_path, metrics=metrics)
+        metrics.finish()
         
-        if not sentences:
+        if not check_results:
             return ["文本内容为空，请检查上传文件"]
         
-        # 3. 逐句质检
-        check_results = []
-        for idx, sentence in enumerate(sentences, 1):
-            result = check_sentence(sentence, violation_words, invalid_words)
-            
-            # 格式化输出
-            if result['issue_type'] == '无问题':
-                formatted_result = f"{idx}. 句子：{result['sentence']} | 问题：无问题"
-            else:
-                issue_words_str = '、'.join(result['issue_words'])
-                formatted_result = f"{idx}. 句子：{result['sentence']} | 问题：{result['issue_type']} | 问题词：{issue_words_str}"
-            
-            check_results.append(formatted_result)
-        
-        return check_results
+        return [format_result(result) for result in check_results]
     
     except FileNotFoundError as e:
         return [str(e)]
     except Exception as e:
         return [f"质检过程出错：{str(e)}"]
+
+# ========== 缓存命中情况计入运行指标 ==========
+def _cache_metrics() -> list:
+    """导出词库缓存、句子缓存和词库热更新的计数（供 Prometheus 指标使用）"""
+    return [
+        ("qc_lexicon_cache_hits_total", "counter", "Compiled lexicon cache hits (memory).", lexicon_cache.hits),
+        ("qc_lexicon_cache_disk_hits_total", "counter", "Compiled lexicon cache hits (disk).", lexicon_cache.disk_hits),
+        ("qc_lexicon_cache_misses_total", "counter", "Compiled lexicon cache misses.", lexicon_cache.misses),
+        ("qc_sentence_cache_hits_total", "counter", "Sentence result cache hits.", sentence_cache.hits),
+        ("qc_sentence_cache_misses_total", "counter", "Sentence result cache misses.", sentence_cache.misses),
+        ("qc_lexicon_reloads_total", "counter", "Default lexicon hot reloads (including the startup load).",
+         lexicon_watcher.reload_count if lexicon_watcher is not None else 0),
+    ]
+
+registry.add_collector(_cache_metrics)
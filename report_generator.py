@@ -3,44 +3,37 @@
 功能：统计质检结果，生成格式化报告（支持 HTML 高亮显示）
 """
 
-from typing import List
-import re
+import time
+from html import escape
+from typing import Iterable, List, Tuple
 
-def generate_simple_report(check_result_list: List[str]) -> str:
+from quality_check import CheckResult, CheckStats, format_result
+from run_metrics import STAGE_RENDER, RunMetrics, render_metrics_footer
+from word_matcher import CATEGORY_CRITICAL, CATEGORY_INVALID, CATEGORY_MINOR, CATEGORY_OK, CATEGORY_VIOLATION, Hit
+
+def generate_simple_report(check_result_list: List[CheckResult], stats: CheckStats = None) -> str:
     """
     生成简易质检报告
-    参数：check_result_list - 质检结果列表
+    参数：check_result_list - 质检结果列表（CheckResult 记录）
+          stats - 质检时已累加好的统计（可选，省去再次统计）
     返回：格式化的报告字符串
     """
     # 边界情况处理
     if not check_result_list:
         return "暂无质检数据，请先上传文本"
     
-    # 如果是错误信息，直接返回
-    if len(check_result_list) == 1 and ("出错" in check_result_list[0] or "请检查" in check_result_list[0]):
-        return check_result_list[0]
-    
     # ========== 统计数据 ==========
-    total_sentences = len(check_result_list)
-    qualified_sentences = 0  # 合格句子数
-    violation_sentences = 0  # 违规词句子数
-    invalid_sentences = 0    # 无效词句子数
-    
-    for result in check_result_list:
-        if "问题：无问题" in result:
-            qualified_sentences += 1
-        elif "问题：违规词" in result:
-            violation_sentences += 1
-        elif "问题：无效词" in result:
-            invalid_sentences += 1
+    if stats is None:
+        stats = CheckStats.from_results(check_result_list)
     
-    problem_sentences = total_sentences - qualified_sentences
+    total_sentences = stats.total
+    qualified_sentences = stats.qualified  # 合格句子数
+    violation_sentences = stats.violation  # 违规词句子数
+    invalid_sentences = stats.invalid      # 无效词句子数
+    problem_sentences = stats.problem
     
     # 计算质检通过率
-    if total_sentences > 0:
-        pass_rate = (qualified_sentences / total_sentences) * 100
-    else:
-        pass_rate = 0.0
+    pass_rate = stats.pass_rate
     
     # ========== 生成报告 ==========
     report = "=" * 50 + "\n"
@@ -54,50 +47,62 @@ def generate_simple_report(check_result_list: List[str]) -> str:
     report += f"质检通过率：{pass_rate:.2f}%\n\n"
     
     report += "【问题类型分布】\n"
+    if stats.critical:
+        report += f"严重违规问题：{stats.critical} 句\n"
     report += f"违规词问题：{violation_sentences} 句\n"
-    report += f"无效词问题：{invalid_sentences} 句\n\n"
+    report += f"无效词问题：{invalid_sentences} 句\n"
+    if stats.minor:
+        report += f"轻微问题：{stats.minor} 句\n"
+    report += "\n"
     
     report += "【详细问题列表】\n"
     report += "-" * 50 + "\n"
     for result in check_result_list:
-        report += result + "\n"
+        report += format_result(result) + "\n"
     
     report += "=" * 50 + "\n"
     
     return report
 
-def generate_html_report(check_result_list: List[str]) -> str:
+# 详细列表默认每页句子数
+DEFAULT_PAGE_SIZE = 200
+
+# ========== HTML 报告样式（摘要和分页明细共用） ==========
+HTML_STYLE = """
+    <style>
+        .report-container { font-family: Arial, sans-serif; padding: 10px; }
+        .report-title { font-size: 18px; font-weight: bold; color: #333; border-bottom: 2px solid #333; padding-bottom: 5px; margin-bottom: 15px; }
+        .stats-section { background: #f5f5f5; padding: 10px; border-radius: 5px; margin-bottom: 15px; }
+        .stats-item { margin: 5px 0; }
+        .detail-section { margin-top: 15px; }
+        .page-info { color: #666; margin-bottom: 10px; }
+        .sentence-item { padding: 8px; margin: 5px 0; border-left: 3px solid #ddd; background: #fafafa; }
+        .sentence-ok { border-left-color: #4CAF50; background: #f1f8f4; }
+        .sentence-critical { border-left-color: #b71c1c; background: #fce4ec; }
+        .sentence-violation { border-left-color: #f44336; background: #ffebee; }
+        .sentence-invalid { border-left-color: #ff9800; background: #fff3e0; }
+        .sentence-minor { border-left-color: #2196f3; background: #e3f2fd; }
+        .highlight-critical { background: #b71c1c; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }
+        .highlight-violation { background: #ff5252; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }
+        .highlight-invalid { background: #ffa726; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }
+        .highlight-minor { background: #42a5f5; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }
+        .problem-label { font-weight: bold; }
+        .label-ok { color: #4CAF50; }
+        .label-critical { color: #b71c1c; }
+        .label-violation { color: #f44336; }
+        .label-invalid { color: #ff9800; }
+        .label-minor { color: #2196f3; }
+    </style>
+"""
+
+def _render_summary(stats: CheckStats) -> str:
     """
-    生成带颜色高亮的 HTML 质检报告
-    参数：check_result_list - 质检结果列表
-    返回：HTML 格式的报告字符串
+    渲染统计面板（不含样式和外层容器）
+    参数：stats - 质检统计
+    返回：HTML 片段
     """
-    # 边界情况处理
-    if not check_result_list:
-        return "<p>暂无质检数据，请先上传文本</p>"
-    
-    # 如果是错误信息，直接返回
-    if len(check_result_list) == 1 and ("出错" in check_result_list[0] or "请检查" in check_result_list[0]):
-        return f"<p>{check_result_list[0]}</p>"
-    
-    # ========== 统计数据 ==========
-    total_sentences = len(check_result_list)
-    qualified_sentences = 0
-    violation_sentences = 0
-    invalid_sentences = 0
-    
-    for result in check_result_list:
-        if "问题：无问题" in result:
-            qualified_sentences += 1
-        elif "问题：违规词" in result:
-            violation_sentences += 1
-        elif "问题：无效词" in result:
-            invalid_sentences += 1
+    pass_rate = stats.pass_rate
     
-    problem_sentences = total_sentences - qualified_sentences
-    pass_rate = (qualified_sentences / total_sentences) * 100 if total_sentences > 0 else 0.0
-    
-    # ========== 生成 HTML 报告 ==========
     # 确定通过率颜色
     if pass_rate >= 80:
         rate_color = "#4CAF50"
@@ -106,105 +111,218 @@ def generate_html_report(check_result_list: List[str]) -> str:
     else:
         rate_color = "#f44336"
     
-    html = f"""
-    <style>
-        .report-container {{ font-family: Arial, sans-serif; padding: 10px; }}
-        .report-title {{ font-size: 18px; font-weight: bold; color: #333; border-bottom: 2px solid #333; padding-bottom: 5px; margin-bottom: 15px; }}
-        .stats-section {{ background: #f5f5f5; padding: 10px; border-radius: 5px; margin-bottom: 15px; }}
-        .stats-item {{ margin: 5px 0; }}
-        .detail-section {{ margin-top: 15px; }}
-        .sentence-item {{ padding: 8px; margin: 5px 0; border-left: 3px solid #ddd; background: #fafafa; }}
-        .sentence-ok {{ border-left-color: #4CAF50; background: #f1f8f4; }}
-        .sentence-violation {{ border-left-color: #f44336; background: #ffebee; }}
-        .sentence-invalid {{ border-left-color: #ff9800; background: #fff3e0; }}
-        .highlight-violation {{ background: #ff5252; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }}
-        .highlight-invalid {{ background: #ffa726; color: white; padding: 2px 4px; border-radius: 3px; font-weight: bold; }}
-        .problem-label {{ font-weight: bold; }}
-        .label-ok {{ color: #4CAF50; }}
-        .label-violation {{ color: #f44336; }}
-        .label-invalid {{ color: #ff9800; }}
-    </style>
-    <div class="report-container">
+    # 问题类型分布（严重违规、轻微问题只在出现时显示）
+    distribution = []
+    if stats.critical:
+        distribution.append(f'<span style="color: #b71c1c;">严重违规 {stats.critical} 句</span>')
+    distribution.append(f'<span style="color: #f44336;">违规词 {stats.violation} 句</span>')
+    distribution.append(f'<span style="color: #ff9800;">无效词 {stats.invalid} 句</span>')
+    if stats.minor:
+        distribution.append(f'<span style="color: #2196f3;">轻微问题 {stats.minor} 句</span>')
+    
+    return f"""
         <div class="report-title">📊 AI 视频通话文本质检报告</div>
         
         <div class="stats-section">
-            <div class="stats-item"><strong>总句子数：</strong>{total_sentences} 句</div>
-            <div class="stats-item"><strong>合格句子数：</strong><span style="color: #4CAF50;">{qualified_sentences}</span> 句</div>
-            <div class="stats-item"><strong>问题句子数：</strong><span style="color: #f44336;">{problem_sentences}</span> 句</div>
+            <div class="stats-item"><strong>总句子数：</strong>{stats.total} 句</div>
+            <div class="stats-item"><strong>合格句子数：</strong><span style="color: #4CAF50;">{stats.qualified}</span> 句</div>
+            <div class="stats-item"><strong>问题句子数：</strong><span style="color: #f44336;">{stats.problem}</span> 句</div>
             <div class="stats-item"><strong>质检通过率：</strong><span style="color: {rate_color}; font-weight: bold;">{pass_rate:.2f}%</span></div>
             <div class="stats-item" style="margin-top: 10px; padding-top: 10px; border-top: 1px solid #ddd;">
                 <strong>问题类型分布：</strong>
-                <span style="color: #f44336;">违规词 {violation_sentences} 句</span> | 
-                <span style="color: #ff9800;">无效词 {invalid_sentences} 句</span>
+                {' | '.join(distribution)}
             </div>
         </div>
-        
-        <div class="detail-section">
-            <div style="font-weight: bold; margin-bottom: 10px;">📝 详细问题列表：</div>
     """
-    
-    # ========== 处理每一条结果，添加高亮 ==========
-    for result in check_result_list:
-        # 解析结果字符串
-        if "问题：无问题" in result:
-            sentence_class = "sentence-ok"
-            label_class = "label-ok"
-            label_text = "✓ 无问题"
-            # 提取句子内容
-            match = re.search(r'句子：(.+?) \| 问题：', result)
-            sentence_text = match.group(1) if match else result
-            problem_words = ""
-        elif "问题：违规词" in result:
-            sentence_class = "sentence-violation"
-            label_class = "label-violation"
-            label_text = "✗ 违规词"
-            # 提取句子和问题词
-            match_sentence = re.search(r'句子：(.+?) \| 问题：', result)
-            match_words = re.search(r'问题词：(.+?)$', result)
-            sentence_text = match_sentence.group(1) if match_sentence else ""
-            problem_words_list = match_words.group(1).split('、') if match_words else []
-            
-            # 高亮违规词
-            for word in problem_words_list:
-                sentence_text = sentence_text.replace(word, f'<span class="highlight-violation">{word}</span>')
-            problem_words = f' | <strong>问题词：</strong>{match_words.group(1)}' if match_words else ""
-        elif "问题：无效词" in result:
-            sentence_class = "sentence-invalid"
-            label_class = "label-invalid"
-            label_text = "⚠ 无效词"
-            # 提取句子和问题词
-            match_sentence = re.search(r'句子：(.+?) \| 问题：', result)
-            match_words = re.search(r'问题词：(.+?)$', result)
-            sentence_text = match_sentence.group(1) if match_sentence else ""
-            problem_words_list = match_words.group(1).split('、') if match_words else []
-            
-            # 高亮无效词
-            for word in problem_words_list:
-                sentence_text = sentence_text.replace(word, f'<span class="highlight-invalid">{word}</span>')
-            problem_words = f' | <strong>问题词：</strong>{match_words.group(1)}' if match_words else ""
+
+def merge_spans(hits: Iterable[Hit]) -> List[Tuple[int, int]]:
+    """
+    把命中位置合并成互不重叠的区间（处理嵌套、重叠的词库条目）
+    参数：hits - 命中元组 (起始位置, 结束位置, ...)
+    返回：按起始位置排序、互不重叠的 [(起始位置, 结束位置), ...]
+    """
+    spans = []
+    for hit in sorted(hits):
+        start, end = hit[0], hit[1]
+        if spans and start < spans[-1][1]:
+            if end > spans[-1][1]:
+                spans[-1] = (spans[-1][0], end)
         else:
-            sentence_class = "sentence-item"
-            label_class = ""
-            label_text = ""
-            sentence_text = result
-            problem_words = ""
-        
-        # 提取序号
-        match_num = re.match(r'(\d+)\. ', result)
-        num_text = match_num.group(1) if match_num else ""
+            spans.append((start, end))
+    return spans
+
+def highlight_sentence(sentence: str, hits: Iterable[Hit], css_class: str) -> str:
+    """
+    按命中位置一次线性扫描完成 HTML 转义和高亮包裹
+    参数：sentence - 句子原文
+          hits - 命中元组 (起始位置, 结束位置, ...)
+          css_class - 高亮样式类名
+    返回：转义并高亮后的 HTML 片段
+    """
+    parts = []
+    pos = 0
+    for start, end in merge_spans(hits):
+        parts.append(escape(sentence[pos:start]))
+        parts.append(f'<span class="{css_class}">')
+        parts.append(escape(sentence[start:end]))
+        parts.append('</span>')
+        pos = end
+    parts.append(escape(sentence[pos:]))
+    return ''.join(parts)
+
+# 各问题类型的样式后缀和标签
+ISSUE_STYLES = {
+    CATEGORY_CRITICAL: ("critical", "✗ 严重违规"),
+    CATEGORY_VIOLATION: ("violation", "✗ 违规词"),
+    CATEGORY_INVALID: ("invalid", "⚠ 无效词"),
+    CATEGORY_MINOR: ("minor", "ⓘ 轻微问题"),
+}
+
+def _render_result(result: CheckResult) -> str:
+    """
+    渲染单条质检结果（问题词高亮）
+    参数：result - 单句质检结果
+    返回：HTML 片段
+    """
+    style = ISSUE_STYLES.get(result.issue_type)
+    if result.issue_type == CATEGORY_OK:
+        sentence_class = "sentence-ok"
+        label_class = "label-ok"
+        label_text = "✓ 无问题"
+        sentence_text = escape(result.sentence)
+        problem_words = ""
+    elif style is not None:
+        suffix, label_text = style
+        sentence_class = f"sentence-{suffix}"
+        label_class = f"label-{suffix}"
         
-        html += f"""
+        # 按命中位置高亮问题词
+        sentence_text = highlight_sentence(result.sentence, result.hits, f"highlight-{suffix}")
+        problem_words = f' | <strong>问题词：</strong>{escape("、".join(result.issue_words))}'
+    else:
+        sentence_class = "sentence-item"
+        label_class = ""
+        label_text = ""
+        sentence_text = escape(result.sentence)
+        problem_words = ""
+    
+    return f"""
             <div class="{sentence_class}">
-                <span style="color: #666; font-weight: bold;">{num_text}.</span> 
+                <span style="color: #666; font-weight: bold;">{result.line_no}.</span> 
                 {sentence_text}
                 <br>
                 <span class="problem-label {label_class}">{label_text}</span>{problem_words}
             </div>
         """
+
+def paginate_results(check_result_list: List[CheckResult], page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                     problems_only: bool = False) -> Tuple[List[CheckResult], int, int, int]:
+    """
+    取出指定页的结果（页码越界时自动收敛到首页/末页）
+    参数：check_result_list - 质检结果列表
+          page - 页码（从 1 开始）
+          page_size - 每页句子数
+          problems_only - 是否只保留问题句
+    返回：(本页结果, 实际页码, 总页数, 筛选后的句子总数)
+    """
+    if problems_only:
+        check_result_list = [result for result in check_result_list if not result.is_ok]
     
-    html += """
+    total_items = len(check_result_list)
+    total_pages = max(1, (total_items + page_size - 1) // page_size)
+    page = min(max(1, int(page or 1)), total_pages)
+    start = (page - 1) * page_size
+    return check_result_list[start:start + page_size], page, total_pages, total_items
+
+def _render_details(check_result_list: List[CheckResult], page: int = None, page_size: int = DEFAULT_PAGE_SIZE,
+                    problems_only: bool = False) -> str:
+    """
+    渲染详细问题列表（不含样式和外层容器），片段收集后一次 join，耗时与本页句子数成正比
+    参数：check_result_list - 质检结果列表
+          page - 页码（None 表示不分页，输出全部）
+          page_size - 每页句子数
+          problems_only - 是否只显示问题句
+    返回：HTML 片段
+    """
+    if page is None:
+        page_items = [result for result in check_result_list if not result.is_ok] if problems_only else check_result_list
+        page_info = ""
+    else:
+        page_items, page, total_pages, total_items = paginate_results(check_result_list, page, page_size, problems_only)
+        page_info = f'<div class="page-info">第 {page} / {total_pages} 页，共 {total_items} 句</div>'
+    
+    title = "📝 问题句列表：" if problems_only else "📝 详细问题列表："
+    parts = [f"""
+        <div class="detail-section">
+            <div style="font-weight: bold; margin-bottom: 10px;">{title}</div>
+            {page_info}
+    """]
+    parts.extend(_render_result(result) for result in page_items)
+    parts.append("""
         </div>
-    </div>
+    """)
+    return ''.join(parts)
+
+def generate_html_summary(stats: CheckStats) -> str:
     """
+    只生成报告的统计摘要（不依赖明细，可在质检完成后立即展示）
+    参数：stats - 质检统计
+    返回：HTML 格式的摘要字符串
+    """
+    if stats.total == 0:
+        return "<p>暂无质检数据，请先上传文本</p>"
+    return f'{HTML_STYLE}<div class="report-container">{_render_summary(stats)}</div>'
+
+def generate_html_details(check_result_list: List[CheckResult], page: int = 1, page_size: int = DEFAULT_PAGE_SIZE,
+                          problems_only: bool = False) -> str:
+    """
+    按需生成某一页的详细列表（只渲染本页，大文本不会生成超大页面）
+    参数：check_result_list - 质检结果列表
+          page - 页码（从 1 开始）
+          page_size - 每页句子数
+          problems_only - 是否只显示问题句
+    返回：HTML 格式的明细字符串
+    """
+    if not check_result_list:
+        return ""
+    return f'{HTML_STYLE}<div class="report-container">{_render_details(check_result_list, page, page_size, problems_only)}</div>'
+
+def generate_html_report(check_result_list: List[CheckResult], stats: CheckStats = None, page: int = None,
+                         page_size: int = DEFAULT_PAGE_SIZE, problems_only: bool = False,
+                         metrics: RunMetrics = None, show_metrics: bool = False) -> str:
+    """
+    生成带颜色高亮的 HTML 质检报告
+    参数：check_result_list - 质检结果列表（CheckResult 记录）
+          stats - 质检时已累加好的统计（可选，省去再次统计）
+          page - 明细页码（可选，默认输出全部明细）
+          page_size - 每页句子数
+          problems_only - 明细是否只显示问题句
+          metrics - 运行指标（可选，记录报告渲染耗时）
+          show_metrics - 是否在报告底部附加性能指标页脚（需同时传入 metrics）
+    返回：HTML 格式的报告字符串
+    """
+    # 边界情况处理
+    if not check_result_list:
+        return "<p>暂无质检数据，请先上传文本</p>"
+    
+    start = time.perf_counter()
+    
+    # ========== 统计数据 ==========
+    if stats is None:
+        stats = CheckStats.from_results(check_result_list)
+    
+    # ========== 生成 HTML 报告（片段收集后一次拼接） ==========
+    parts = [
+        HTML_STYLE,
+        '<div class="report-container">',
+        _render_summary(stats),
+        _render_details(check_result_list, page, page_size, problems_only),
+    ]
+    
+    if metrics is not None:
+        metrics.add(STAGE_RENDER, time.perf_counter() - start)
+        if show_metrics:
+            parts.append(render_metrics_footer(metrics))
     
-    return html
+    parts.append('</div>')
+    return ''.join(parts)
@@ -0,0 +1,231 @@
+"""
+模块 11：结构化结果导出
+功能：质检结果边产出边导出为 JSONL（每句一行）或本地 SQLite 数据库（每个命中一行，批量事务写入），
+      数据库按命中词、问题类别、文件建索引，便于在海量结果上做下游统计查询
+用法：with SqliteExporter('qc_results.db') as exporter:
+          for result in tee_results(iter_quality_check(path, matcher), path, exporter): ...
+"""
+
+import json
+import sqlite3
+import time
+from typing import Iterable, Iterator, Optional
+
+from quality_check import CheckResult, CheckStats
+
+# SQLite 每个事务写入的行数
+DEFAULT_BATCH_SIZE = 5000
+
+# 命中表：每个命中一行（只记录问题句），下游按词、类别、时间范围查询
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hits (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    line_no INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    word TEXT NOT NULL,
+    start_pos INTEGER NOT NULL,
+    end_pos INTEGER NOT NULL,
+    sentence TEXT NOT NULL,
+    checked_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hits_word ON hits (word, checked_at);
+CREATE INDEX IF NOT EXISTS idx_hits_category ON hits (category, checked_at);
+CREATE INDEX IF NOT EXISTS idx_hits_file ON hits (file, line_no);
+"""
+
+def now_timestamp() -> str:
+    """当前本地时间（与 SQLite 的 datetime('now', 'localtime') 格式一致，可直接按字符串比较）"""
+    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+def result_to_dict(result: CheckResult) -> dict:
+    """
+    把质检结果转成可 JSON 序列化的字典
+    参数：result - 单句质检结果
+    返回：{'line_no', 'sentence', 'issue_type', 'issue_words', 'hits': [[起始, 结束, 词], ...]}
+    """
+    return {
+        'line_no': result.line_no,
+        'sentence': result.sentence,
+        'issue_type': result.issue_type,
+        'issue_words': result.issue_words,
+        'hits': [[start, end, word] for start, end, word, _ in result.hits],
+    }
+
+def stats_to_dict(stats: CheckStats) -> dict:
+    """
+    把统计转成可 JSON 序列化的字典
+    参数：stats - 统计计数器
+    返回：{'total', 'qualified', 'critical', 'violation', 'invalid', 'minor', 'pass_rate'}
+    """
+    row = {field: getattr(stats, field) for field in CheckStats.__slots__}
+    row['pass_rate'] = round(stats.pass_rate, 2)
+    return row
+
+# ========== JSONL 导出 ==========
+class JsonlExporter:
+    """
+    JSONL 导出器：每句一行 JSON，边质检边写出，内存占用与文本大小无关
+    参数：path - 输出文件路径
+          problems_only - 是否只导出问题句
+          checked_at - 质检时间（默认为创建导出器的时间）
+          append - 是否追加到已有文件（False 时覆盖）
+    """
+    
+    def __init__(self, path: str, problems_only: bool = False, checked_at: Optional[str] = None,
+                 append: bool = True):
+        self.path = path
+        self.problems_only = problems_only
+        self.checked_at = checked_at or now_timestamp()
+        self.rows = 0
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        # 当前文件开始导出时的写入位置和行数（放弃该文件时据此截断）
+        self._file_start = (self._file.tell(), 0)
+    
+    def start_file(self, file_name: str) -> None:
+        """开始导出一个文件的结果：记下当前写入位置，放弃该文件时截断回这里"""
+        self._file_start = (self._file.tell(), self.rows)
+    
+    def write(self, file_name: str, result: CheckResult) -> None:
+        """
+        写出一条结果
+        参数：file_name - 结果所属的文本文件
+              result - 单句质检结果
+        """
+        if self.problems_only and result.is_ok:
+            return
+        row = result_to_dict(result)
+        row['file'] = file_name
+        row['checked_at'] = self.checked_at
+        self._file.write(json.dumps(row, ensure_ascii=False))
+        self._file.write('\n')
+        self.rows += 1
+    
+    def flush(self) -> None:
+        """把缓冲写入磁盘"""
+        self._file.flush()
+    
+    def discard_file(self, file_name: str) -> None:
+        """
+        放弃当前文件已导出的结果（质检中途失败时调用，截断回 start_file 时的位置）
+        参数：file_name - 文本文件
+        """
+        offset, rows = self._file_start
+        self._file.seek(offset)
+        self._file.truncate()
+        self.rows = rows
+    
+    def close(self) -> None:
+        """关闭输出文件"""
+        if not self._file.closed:
+            self._file.close()
+    
+    def __enter__(self) -> 'JsonlExporter':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# ========== SQLite 导出 ==========
+class SqliteExporter:
+    """
+    SQLite 导出器：命中行先缓冲，攒满一批后在一个事务中 executemany 写入
+    同一次运行（相同的 checked_at）内重新导出同一个文件时替换该文件本次的命中，避免重复计数；
+    不同时间的运行即使文件路径相同（如每天复用的导出目录）也各自保留，历史记录不会被覆盖
+    参数：path - 数据库文件路径（不存在时自动建表建索引）
+          batch_size - 每个事务写入的行数
+          checked_at - 质检时间，同时作为本次运行的标识（默认为创建导出器的时间；多个工作进程应传入同一个值）
+          timeout - 等待其他进程释放写锁的秒数（批量质检的多个工作进程可写同一个数据库）
+    """
+    
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE, checked_at: Optional[str] = None,
+                 timeout: float = 30.0):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.checked_at = checked_at or now_timestamp()
+        self.rows = 0
+        self._pending = []
+        # isolation_level=None：由本类显式控制事务边界
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SQLITE_SCHEMA)
+    
+    def start_file(self, file_name: str) -> None:
+        """
+        开始导出一个文件的结果：删除该文件在本次运行中已导出的命中（其他运行的记录保留）
+        参数：file_name - 文本文件
+        """
+        self.flush()
+        self._conn.execute("DELETE FROM hits WHERE file = ? AND checked_at = ?", (file_name, self.checked_at))
+    
+    def discard_file(self, file_name: str) -> None:
+        """
+        放弃一个文件在本次运行中的全部命中（质检中途失败时调用，已提交的批次一并删除，与汇总表保持一致）
+        参数：file_name - 文本文件
+        """
+        self._pending = [row for row in self._pending if row[0] != file_name]
+        cursor = self._conn.execute("DELETE FROM hits WHERE file = ? AND checked_at = ?", (file_name, self.checked_at))
+        self.rows -= cursor.rowcount
+    
+    def write(self, file_name: str, result: CheckResult) -> None:
+        """
+        缓冲一条结果的全部命中（无问题的句子不写入）
+        参数：file_name - 结果所属的文本文件
+              result - 单句质检结果
+        """
+        if not result.hits:
+            return
+        for start, end, word, category in result.hits:
+            self._pending.append((file_name, result.line_no, category, word, start, end,
+                                  result.sentence, self.checked_at))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self) -> None:
+        """把缓冲的命中在一个事务中写入数据库"""
+        if not self._pending:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT INTO hits (file, line_no, category, word, start_pos, end_pos, sentence, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._pending)
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        self.rows += len(self._pending)
+        self._pending = []
+    
+    def close(self) -> None:
+        """写入剩余缓冲并关闭数据库连接"""
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+    
+    def __enter__(self) -> 'SqliteExporter':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+# ========== 流式导出 ==========
+def tee_results(results: Iterable[CheckResult], file_name: str, *exporters) -> Iterator[CheckResult]:
+    """
+    边产出边导出：原样转发质检结果，同时写入各个导出器
+    参数：results - 质检结果流（如 iter_quality_check 的返回值）
+          file_name - 结果所属的文本文件
+          exporters - JsonlExporter / SqliteExporter
+    返回：CheckResult 生成器（结束时把本文件的缓冲写入）
+    """
+    for exporter in exporters:
+        exporter.start_file(file_name)
+    for result in results:
+        for exporter in exporters:
+            exporter.write(file_name, result)
+        yield result
+    for exporter in exporters:
+        exporter.flush()
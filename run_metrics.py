@@ -0,0 +1,164 @@
+"""
+模块 8：运行指标采集
+功能：记录每次质检各阶段耗时（词库加载、文本读取、匹配、报告渲染）、处理速度和词库规模，
+      输出结构化日志，并在进程内累计成 Prometheus 文本格式的指标
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+logger = logging.getLogger("quality_check.metrics")
+
+# 阶段名称（日志、页脚和 Prometheus 标签共用）
+STAGE_LEXICON = 'lexicon_load'
+STAGE_READ = 'text_read'
+STAGE_MATCH = 'match'
+STAGE_RENDER = 'html_render'
+
+# 阶段中文名（报告页脚展示用）
+STAGE_LABELS = {
+    STAGE_LEXICON: '词库加载',
+    STAGE_READ: '文本读取',
+    STAGE_MATCH: '匹配',
+    STAGE_RENDER: '报告渲染',
+}
+
+# ========== 单次质检的指标 ==========
+class RunMetrics:
+    """
+    单次质检的运行指标
+    属性：stages - {阶段名: 耗时秒数}，按首次记录的顺序排列
+          lines - 质检句子数
+          lexicon_size - 词库词条数
+    """
+    
+    def __init__(self, source: str = ''):
+        self.source = source
+        self.stages = OrderedDict()
+        self.lines = 0
+        self.lexicon_size = 0
+    
+    def add(self, stage: str, seconds: float) -> None:
+        """累加某个阶段的耗时"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+    
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """计时上下文：with metrics.stage('match'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+    
+    @property
+    def total_seconds(self) -> float:
+        """各阶段耗时合计"""
+        return sum(self.stages.values())
+    
+    @property
+    def lines_per_second(self) -> float:
+        """匹配速度（句/秒），按读取 + 匹配阶段计算"""
+        seconds = self.stages.get(STAGE_READ, 0.0) + self.stages.get(STAGE_MATCH, 0.0)
+        return self.lines / seconds if seconds > 0 else 0.0
+    
+    def to_dict(self) -> dict:
+        """转成可序列化的字典"""
+        return {
+            'source': self.source,
+            'lines': self.lines,
+            'lexicon_size': self.lexicon_size,
+            'lines_per_second': round(self.lines_per_second, 1),
+            'total_ms': round(self.total_seconds * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+        }
+    
+    def finish(self) -> None:
+        """本次质检结束：写一行结构化日志并计入进程内累计指标"""
+        logger.info("quality_check_run %s", json.dumps(self.to_dict(), ensure_ascii=False))
+        registry.record(self)
+
+# ========== 进程内累计指标 ==========
+# 采集器返回 [(指标名, 类型, 说明, 值), ...]，用于导出缓存命中数等外部计数
+Collector = Callable[[], List[Tuple[str, str, str, float]]]
+
+class MetricsRegistry:
+    """进程内累计的质检指标，可渲染成 Prometheus 文本格式"""
+    
+    def __init__(self):
+        self.runs = 0
+        self.lines = 0
+        self.stage_seconds = {}
+        self.stage_counts = {}
+        self.last_lines_per_second = 0.0
+        self.last_lexicon_size = 0
+        self._collectors = []
+        self._lock = threading.Lock()
+    
+    def record(self, metrics: RunMetrics) -> None:
+        """计入一次质检的指标"""
+        with self._lock:
+            self.runs += 1
+            self.lines += metrics.lines
+            for stage, seconds in metrics.stages.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+                self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+            self.last_lines_per_second = metrics.lines_per_second
+            self.last_lexicon_size = metrics.lexicon_size
+    
+    def add_collector(self, collector: Collector) -> None:
+        """注册额外的指标采集函数"""
+        self._collectors.append(collector)
+    
+    def render_prometheus(self) -> str:
+        """
+        渲染 Prometheus 文本格式（text/plain; version=0.0.4）
+        返回：指标文本
+        """
+        with self._lock:
+            lines = [
+                "# HELP qc_runs_total Number of completed quality checks.",
+                "# TYPE qc_runs_total counter",
+                f"qc_runs_total {self.runs}",
+                "# HELP qc_lines_total Number of transcript lines checked.",
+                "# TYPE qc_lines_total counter",
+                f"qc_lines_total {self.lines}",
+                "# HELP qc_stage_duration_seconds Time spent per quality check stage.",
+                "# TYPE qc_stage_duration_seconds summary",
+            ]
+            for stage in sorted(self.stage_seconds):
+                lines.append(f'qc_stage_duration_seconds_sum{{stage="{stage}"}} {self.stage_seconds[stage]:.6f}')
+                lines.append(f'qc_stage_duration_seconds_count{{stage="{stage}"}} {self.stage_counts[stage]}')
+            lines += [
+                "# HELP qc_last_run_lines_per_second Matching throughput of the most recent check.",
+                "# TYPE qc_last_run_lines_per_second gauge",
+                f"qc_last_run_lines_per_second {self.last_lines_per_second:.1f}",
+                "# HELP qc_last_run_lexicon_size Lexicon entries used by the most recent check.",
+                "# TYPE qc_last_run_lexicon_size gauge",
+                f"qc_last_run_lexicon_size {self.last_lexicon_size}",
+            ]
+        
+        for collector in self._collectors:
+            for name, metric_type, help_text, value in collector():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+# 进程内全局指标
+registry = MetricsRegistry()
+
+def render_metrics_footer(metrics: RunMetrics) -> str:
+    """
+    生成报告底部的性能指标页脚（HTML）
+    参数：metrics - 本次质检指标
+    返回：HTML 片段
+    """
+    stages = ' | '.join(f"{STAGE_LABELS.get(stage, stage)} {seconds * 1000:.1f} ms"
+                        for stage, seconds in metrics.stages.items())
+    return (f'<div class="metrics-footer" style="margin-top: 15px; padding-top: 8px; border-top: 1px dashed #ccc; '
+            f'color: #999; font-size: 12px;">⏱ {stages} | {metrics.lines} 句，'
+            f'{metrics.lines_per_second:.0f} 句/秒 | 词库 {metrics.lexicon_size} 词</div>')
@@ -0,0 +1,179 @@
+"""
+模块 4：多模式词库匹配器
+功能：基于 Aho-Corasick 自动机，词库只编译一次，每个句子只扫描一遍即可找出全部命中词；
+      匹配前统一做文本归一化（全角转半角、大小写、去空白和标点），命中位置映射回原句
+"""
+
+import os
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ========== 问题类别（严重违规 > 违规词 > 无效词 > 轻微问题） ==========
+CATEGORY_CRITICAL = '严重违规'
+CATEGORY_VIOLATION = '违规词'
+CATEGORY_INVALID = '无效词'
+CATEGORY_MINOR = '轻微问题'
+CATEGORY_OK = '无问题'
+# 例外词：命中区间内包含的问题词不再计为命中（如"禁止吸烟"中的"禁止"）
+CATEGORY_ALLOW = '例外词'
+
+# 全部严重等级，按优先级从高到低排列
+SEVERITY_TIERS = (CATEGORY_CRITICAL, CATEGORY_VIOLATION, CATEGORY_INVALID, CATEGORY_MINOR)
+
+# 单个命中：(起始位置, 结束位置, 命中词, 类别)，结束位置不含
+Hit = Tuple[int, int, str, str]
+
+# ========== 文本归一化（一张字符转换表，每句只调用一次 str.translate） ==========
+# 需要检查的字符区段：Latin-1、通用标点、CJK 标点、竖排/小写变体、全角/半角形式
+_NORMALIZE_RANGES = [(0x0000, 0x00FF), (0x2000, 0x206F), (0x3000, 0x303F),
+                     (0xFE10, 0xFE1F), (0xFE30, 0xFE6F), (0xFF00, 0xFF65)]
+
+def _build_normalize_table() -> Tuple[Dict[int, Optional[str]], frozenset]:
+    """
+    构建归一化转换表：全角字符转半角、英文字母转小写、空白/标点/格式字符删除
+    返回：(str.translate 使用的转换表, 被删除的字符集合)
+    说明：表中每个字符要么一对一替换，要么被删除，因此归一化前后长度相等即说明没有删除任何字符
+    """
+    table = {}
+    deleted = set()
+    for first, last in _NORMALIZE_RANGES:
+        for code in range(first, last + 1):
+            ch = chr(code)
+            mapped = chr(code - 0xFEE0) if 0xFF01 <= code <= 0xFF5E else ch
+            category = unicodedata.category(mapped)
+            if mapped.isspace() or category[0] in 'PZ' or category in ('Cf', 'Sk', 'Sm'):
+                table[code] = None
+                deleted.add(ch)
+            elif 'A' <= mapped <= 'Z':
+                table[code] = mapped.lower()
+            elif mapped != ch:
+                table[code] = mapped
+    return table, frozenset(deleted)
+
+NORMALIZE_TABLE, _DELETED_CHARS = _build_normalize_table()
+
+def normalize_text(text: str) -> Tuple[str, Optional[List[int]]]:
+    """
+    归一化文本（耗时与文本长度成线性关系）
+    参数：text - 原始文本
+    返回：(归一化后的文本, 归一化文本每个字符在原文中的位置)；没有删除字符时位置一一对应，返回 None
+    """
+    normalized = text.translate(NORMALIZE_TABLE)
+    if len(normalized) == len(text):
+        return normalized, None
+    return normalized, [idx for idx, ch in enumerate(text) if ch not in _DELETED_CHARS]
+
+class WordMatcher:
+    """
+    Aho-Corasick 多模式匹配器
+    参数：categories - [(类别, 词列表), ...]，按优先级从高到低排列；
+                      同一个词出现在多个类别时，只归入优先级最高的类别
+          allow_words - 例外词列表，与问题词编译进同一个自动机；被例外词完整覆盖的命中会被忽略，
+                        例外词与问题词完全相同时以例外词为准
+          normalize - 是否在匹配前归一化（词库在编译时归一化，句子在扫描前归一化）
+    说明：扫描耗时只与句子长度和命中数有关，与词库大小、等级数和例外词数无关
+    属性：version - 词库版本标识（词库缓存按文件内容哈希填写，否则为随机生成的唯一标识）
+    """
+    
+    __slots__ = ('categories', 'rank', 'word_count', 'allow_count', 'version', 'normalize', '_goto', '_fail', '_output')
+    
+    def __init__(self, categories: Sequence[Tuple[str, Iterable[str]]], allow_words: Iterable[str] = (),
+                 normalize: bool = True):
+        self.normalize = normalize
+        self.categories = tuple(category for category, _ in categories)
+        self.rank = {category: idx for idx, category in enumerate(self.categories)}
+        
+        goto: List[Dict[str, int]] = [{}]
+        own_output: List[Tuple[Tuple[int, str, str], ...]] = [()]
+        seen = set()
+        allow_count = 0
+        
+        # 1. 构建字典树（插入归一化后的词，输出中保留词库原词；例外词最先插入）
+        for category, words in [(CATEGORY_ALLOW, allow_words)] + list(categories):
+            for word in words:
+                key = normalize_text(word)[0] if normalize else word
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                if category == CATEGORY_ALLOW:
+                    allow_count += 1
+                node = 0
+                for ch in key:
+                    nxt = goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[node][ch] = nxt
+                        goto.append({})
+                        own_output.append(())
+                    node = nxt
+                own_output[node] = ((len(key), word, category),)
+        
+        # 2. 广度优先计算失配指针，并把失配链上的输出合并到当前节点
+        fail = [0] * len(goto)
+        output = list(own_output)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                target = goto[state].get(ch, 0)
+                fail[child] = target if target != child else 0
+                output[child] = own_output[child] + output[fail[child]]
+        
+        self.word_count = len(seen) - allow_count
+        self.allow_count = allow_count
+        self.version = f"local-{os.urandom(16).hex()}"
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+    
+    def find_all(self, text: str) -> List[Hit]:
+        """
+        单次扫描找出文本中的全部命中词
+        参数：text - 待扫描文本
+        返回：命中列表 [(起始位置, 结束位置, 命中词, 类别), ...]，按结束位置排序；
+              位置为原文中的位置（归一化时删除的字符被包含在命中区间内），命中词为词库原词；
+              不含例外词本身，也不含被例外词覆盖的命中
+        """
+        offsets = None
+        if self.normalize:
+            text, offsets = normalize_text(text)
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        hits = []
+        allowed = []
+        node = 0
+        
+        for idx, ch in enumerate(text):
+            while True:
+                nxt = goto[node].get(ch)
+                if nxt is not None:
+                    node = nxt
+                    break
+                if not node:
+                    break
+                node = fail[node]
+            
+            if output[node]:
+                end = idx + 1
+                for length, word, category in output[node]:
+                    if category == CATEGORY_ALLOW:
+                        allowed.append((end - length, end))
+                    else:
+                        hits.append((end - length, end, word, category))
+        
+        # 去掉被例外词完整覆盖的命中（同一次扫描中已找出例外词位置，无需再扫描）
+        if allowed:
+            hits = [hit for hit in hits
+                    if not any(start <= hit[0] and hit[1] <= end for start, end in allowed)]
+        
+        # 把归一化文本中的位置映射回原文
+        if offsets is not None:
+            hits = [(offsets[start], offsets[end - 1] + 1, word, category) for start, end, word, category in hits]
+        return hits